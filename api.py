@@ -0,0 +1,337 @@
+import gzip
+import json
+from datetime import datetime, date, timedelta
+from flask import Blueprint, Response, request, abort, current_app
+from models import db, Venue, Artist
+from cache import responseCache
+from customValidator import page_args
+from forms import genreValues
+import queries
+import search
+import geo
+import scheduling
+import suggest
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+#----------------------------------------------------------------------------#
+# Serialization.
+#----------------------------------------------------------------------------#
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def select_fields(record):
+    # ?fields=id,name trims every record to the listed keys
+    fields = request.args.get('fields')
+    if not fields:
+        return record
+    wanted = set(fields.split(','))
+    return {key: value for key, value in record.items() if key in wanted}
+
+
+def json_response(payload, tags=None):
+    # Last-Modified is the last invalidation of the tags; without tags the response
+    # is only revalidated by its ETag
+    body = json.dumps(payload, separators=(',', ':'), default=_default)
+    response = Response(body, mimetype='application/json')
+    if tags is not None:
+        response.last_modified = responseCache.last_modified(tags)
+    return response
+
+
+def page_response(page, serialize, tags):
+    return json_response({
+        "data": [select_fields(serialize(item)) for item in page.items],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor,
+    }, tags)
+
+
+def venue_summary(row):
+    return {"id": row.id, "name": row.name, "city": row.city, "state": row.state,
+            "num_upcoming_shows": row.num_upcoming_shows}
+
+
+def artist_summary(row):
+    return {"id": row.id, "name": row.name}
+
+
+def search_summary(entity):
+    return {"id": entity.id, "name": entity.name, "city": entity.city, "state": entity.state,
+            "num_upcoming_shows": entity.upcoming_shows_count}
+
+
+def genre_summary(row):
+    return {"id": row.id, "name": row.name, "city": row.city, "state": row.state,
+            "num_upcoming_shows": row.num_upcoming_shows}
+
+
+def calendar_event(row):
+    return {"id": row.id, "start_time": row.start_time, "venue_id": row.venue_id, "venue_name": row.venue_name,
+            "city": row.city, "state": row.state, "artist_id": row.artist_id, "artist_name": row.artist_name}
+
+
+def ical_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ical_fold(line):
+    # content lines longer than 75 octets continue on the next line after a space
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts)
+
+
+def ical_feed(rows, stamp, minutes):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Fyyur//Shows//EN', 'CALSCALE:GREGORIAN',
+             'X-WR-CALNAME:Fyyur shows']
+    for row in rows:
+        lines += [
+            'BEGIN:VEVENT',
+            'UID:show-{0}@fyyur'.format(row.id),
+            'DTSTAMP:' + stamp.strftime('%Y%m%dT%H%M%SZ'),
+            'DTSTART:' + row.start_time.strftime('%Y%m%dT%H%M%S'),
+            'DURATION:PT{0}M'.format(minutes),
+            'SUMMARY:' + ical_text('{0} at {1}'.format(row.artist_name, row.venue_name)),
+            'LOCATION:' + ical_text(', '.join(part for part in (row.venue_address, row.city, row.state) if part)),
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(ical_fold(line) for line in lines) + '\r\n'
+
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+def paged(build, *args):
+    try:
+        return build(*args, **page_args())
+    except ValueError:
+        abort(400)
+
+
+@api.route('/venues')
+@responseCache.cached(lambda: ['venues'])
+def venues():
+    page = paged(queries.keyset_page, queries.venue_areas_query(), [Venue.state, Venue.city, Venue.id])
+    return page_response(page, venue_summary, ['venues'])
+
+
+@api.route('/venues/<int:venue_id>')
+@responseCache.cached(lambda venue_id: ['venue:{0}'.format(venue_id)])
+def venue(venue_id):
+    data = queries.venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    return json_response(select_fields(data), ['venue:{0}'.format(venue_id)])
+
+
+@api.route('/artists')
+@responseCache.cached(lambda: ['artists'])
+def artists():
+    return page_response(paged(queries.artists_page), artist_summary, ['artists'])
+
+
+@api.route('/artists/<int:artist_id>')
+@responseCache.cached(lambda artist_id: ['artist:{0}'.format(artist_id)])
+def artist(artist_id):
+    data = queries.artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    return json_response(select_fields(data), ['artist:{0}'.format(artist_id)])
+
+
+@api.route('/shows')
+@responseCache.cached(lambda: ['shows'])
+def shows():
+    return page_response(paged(queries.upcoming_shows_page), dict, ['shows'])
+
+
+@api.route('/shows/batch', methods=['POST'])
+def schedule_shows():
+    # {"shows": [{"artist_id": 1, "venue_id": 2, "start_time": "2026-11-01 20:00:00"}, ...]}
+    # inserted in one transaction: all of them, or with ?partial=true the valid ones.
+    # Every rejected row is reported with its 1-based position
+    payload = request.get_json(silent=True)
+    rows = payload.get('shows') if isinstance(payload, dict) else None
+    if not isinstance(rows, list) or not rows:
+        abort(400)
+    if len(rows) > current_app.config.get('SCHEDULE_MAX_SHOWS', 1000):
+        abort(413)
+    partial = request.args.get('partial', '').lower() == 'true'
+    created, errors = scheduling.schedule_shows(enumerate(rows, 1), partial)
+    if created:
+        db.session.commit()
+        scheduling.shows_changed(created)
+    else:
+        db.session.rollback()
+    body = json.dumps({"created": len(created), "errors": [{"row": rowNo, "error": error} for rowNo, error in errors]},
+                      separators=(',', ':'))
+    return Response(body, status=201 if created else 422, mimetype='application/json')
+
+
+def calendar_filters():
+    # ?week=2026-W42, ?month=2026-10 or ?start=2026-10-01&end=2026-11-01 (end exclusive,
+    # a month from start by default), narrowed by ?city=, ?state=, ?genre= and ?venue=
+    args = request.args
+    if args.get('week'):
+        start = datetime.strptime(args['week'] + '-1', '%G-W%V-%u')
+        end = start + timedelta(days=7)
+    elif args.get('month'):
+        start = datetime.strptime(args['month'], '%Y-%m')
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        start = datetime.strptime(args['start'], '%Y-%m-%d') if args.get('start') \
+            else datetime.combine(date.today(), datetime.min.time())
+        end = datetime.strptime(args['end'], '%Y-%m-%d') if args.get('end') else start + timedelta(days=31)
+    if not start < end <= start + timedelta(days=current_app.config.get('CALENDAR_MAX_DAYS', 92)):
+        raise ValueError('Invalid date range')
+    if args.get('genre') and args['genre'] not in genreValues:
+        raise ValueError('Unknown genre: {0}'.format(args['genre']))
+    return dict(start=start, end=end, city=args.get('city'), state=args.get('state'), genre=args.get('genre'),
+                venue_id=args.get('venue', type=int))
+
+
+def calendar_query():
+    try:
+        return queries.calendar_query(**calendar_filters())
+    except ValueError:
+        abort(400)
+
+
+@api.route('/calendar')
+@responseCache.cached(lambda: ['shows'])
+def calendar():
+    page = paged(queries.calendar_page, calendar_query())
+    return page_response(page, calendar_event, ['shows'])
+
+
+@api.route('/calendar.ics')
+@responseCache.cached(lambda: ['shows'])
+def calendar_feed():
+    rows = queries.calendar_events(calendar_query(), current_app.config.get('CALENDAR_MAX_EVENTS', 5000))
+    # DTSTAMP is the last change to the shows, so an unchanged feed keeps its ETag
+    modified = responseCache.last_modified(['shows'])
+    response = Response(ical_feed(rows, modified or datetime.utcnow(),
+                                  current_app.config.get('SHOW_DURATION_MINUTES', 120)),
+                        mimetype='text/calendar')
+    response.last_modified = modified
+    return response
+
+
+def known_genre(genre):
+    if genre not in genreValues:
+        abort(404)
+
+
+@api.route('/venues/genre/<genre>')
+@responseCache.cached(lambda genre: ['venues'])
+def venues_by_genre(genre):
+    known_genre(genre)
+    return page_response(paged(queries.genre_page, Venue, genre), genre_summary, ['venues'])
+
+
+@api.route('/artists/genre/<genre>')
+@responseCache.cached(lambda genre: ['artists', 'shows'])
+def artists_by_genre(genre):
+    # num_upcoming_shows changes with every new show, which only invalidates 'shows'
+    known_genre(genre)
+    return page_response(paged(queries.genre_page, Artist, genre), genre_summary, ['artists', 'shows'])
+
+
+@api.route('/venues/near')
+@responseCache.cached(lambda: ['venues', 'shows'])
+def venues_near():
+    # ?lat=&lon= or ?city=&state=, nearest first; only venues with upcoming shows
+    if request.args.get('lat') and request.args.get('lon'):
+        try:
+            point = (float(request.args['lat']), float(request.args['lon']))
+        except ValueError:
+            abort(400)
+        if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+            abort(400)
+    else:
+        point = geo.geocode(request.args.get('city'), request.args.get('state'))
+        if point is None:
+            abort(400)
+    limit = min(request.args.get('limit', 10, type=int), current_app.config.get('GEO_MAX_RESULTS', 100))
+    if limit < 1:
+        abort(400)
+    results = geo.nearest_venues(point[0], point[1], limit)
+    return json_response({"latitude": point[0], "longitude": point[1], "data": [
+        select_fields(dict(venue_summary(row), address=row.address, distance_km=round(km, 1)))
+        for row, km in results]}, ['venues', 'shows'])
+
+
+@api.route('/venues/search')
+@responseCache.cached(lambda: ['venues'])
+def search_venues():
+    page = paged(search.search_page, Venue, request.args.get('q', ''))
+    return page_response(page, search_summary, ['venues'])
+
+
+@api.route('/artists/search')
+@responseCache.cached(lambda: ['artists', 'shows'])
+def search_artists():
+    # num_upcoming_shows changes with every new show, which only invalidates 'shows'
+    page = paged(search.search_page, Artist, request.args.get('q', ''))
+    return page_response(page, search_summary, ['artists', 'shows'])
+
+
+@api.route('/suggest')
+def suggestions():
+    # type-ahead for the search boxes: venues, artists and cities whose name has a
+    # word starting with ?q=. Answered from memory, so neither response-cached nor
+    # given a Last-Modified, which would take a query
+    limit = min(request.args.get('limit', 10, type=int), current_app.config.get('SUGGEST_MAX_RESULTS', 20))
+    if limit < 1:
+        abort(400)
+    results = suggest.suggest(request.args.get('q', ''), limit)
+    return json_response({"data": [{"type": kind, "id": entityId, "name": label}
+                                   for kind, entityId, label in results]})
+
+
+#----------------------------------------------------------------------------#
+# Revalidation and compression.
+#----------------------------------------------------------------------------#
+
+@api.after_request
+def conditional_and_compressed(response):
+    if request.method != 'GET' or response.status_code != 200 or response.is_streamed:
+        return response
+    # weak ETags stay valid across the gzip/brotli encodings below
+    if not response.get_etag()[0]:
+        response.add_etag(weak=True)
+    response.make_conditional(request)
+    if response.status_code != 200:
+        return response
+    body = response.get_data()
+    accepted = request.headers.get('Accept-Encoding', '')
+    response.vary.add('Accept-Encoding')
+    if len(body) < current_app.config.get('API_COMPRESS_MIN_SIZE', 500):
+        return response
+    if brotli is not None and 'br' in accepted:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accepted:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
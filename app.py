@@ -1,60 +1,108 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, jsonify, url_for
+from flask import Flask, render_template, request, flash, redirect, jsonify, url_for, abort
 from flask_moment import Moment
 from flask_cors import CORS
-from sqlalchemy import or_
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy.exc import IntegrityError
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from customValidator import flash_errors
-import sys, os
-from datetime import datetime
-from models import setup_db, Venue, Artist, Show
+from customValidator import flash_errors, page_args
+from streaming import stream_template, wants_stream
+import sys
+from forms import VenueForm, ArtistForm, ShowForm
+from models import setup_db, db, Venue, Artist, Show, ShowArchive
+import queries
+import search
+import geo
+import scheduling
+import suggest
+from cache import responseCache
+from api import api
+from dateformat import format_datetime
+from poolstats import poolStats
+from routing import replicas
+from profiler import sqlProfiler
+from metrics import metrics
+from assets import assets
+from jinjacache import templateCache
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-migrate = Migrate()
 moment = Moment()
-db = SQLAlchemy()
 
 def create_app(test_config=None):
   app = Flask(__name__)
   app.config.from_object('config')
+  if test_config:
+    app.config.update(test_config)
   moment = Moment(app)
   CORS(app)
   setup_db(app)
   moment.init_app(app)
-  migrate.init_app(app)
+  responseCache.init_app(app)
+  app.register_blueprint(api)
+  poolStats.install()
+  replicas.init_app(app)
+  sqlProfiler.init_app(app)
+  metrics.init_app(app)
+  assets.init_app(app)
+  templateCache.init_app(app)
 
   #----------------------------------------------------------------------------#
   # Filters.
   #----------------------------------------------------------------------------#
 
-  def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format="EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format="EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
   app.jinja_env.filters['datetime'] = format_datetime
 
+  #----------------------------------------------------------------------------#
+  # Invalidation.
+  #----------------------------------------------------------------------------#
+
+  # Called once a write is committed, outside the try that reports its result: the
+  # row is saved either way, so a failure here is logged rather than shown as a
+  # failed save.
+
+  def venue_changed(venue_id, artistIds=(), deleted=False):
+    # drops the search index and cached pages derived from a venue after a write,
+    # and updates its suggestions. A delete also lowers its artists' upcoming show
+    # counts, which the artist pages list
+    try:
+      search.invalidate(Venue)
+      geo.invalidate()
+      suggest.changed(Venue, venue_id)
+      tags = ['venues', 'shows', 'venue:{0}'.format(venue_id)] + ['artist:{0}'.format(artistId) for artistId in artistIds]
+      if deleted:
+        tags.append('artists')
+      responseCache.invalidate(*tags)
+    except Exception:
+      app.logger.exception('invalidation failed after a write to venue %s', venue_id)
+
+  def artist_changed(artist_id, venueIds=(), deleted=False):
+    try:
+      search.invalidate(Artist)
+      suggest.changed(Artist, artist_id)
+      tags = ['artists', 'shows', 'artist:{0}'.format(artist_id)] + ['venue:{0}'.format(venueId) for venueId in venueIds]
+      if deleted:
+        tags.append('venues')
+      responseCache.invalidate(*tags)
+    except Exception:
+      app.logger.exception('invalidation failed after a write to artist %s', artist_id)
+
+  def show_changed(venue_id, artist_id):
+    try:
+      responseCache.invalidate('venues', 'shows', 'venue:{0}'.format(venue_id), 'artist:{0}'.format(artist_id))
+    except Exception:
+      app.logger.exception('invalidation failed after a new show at venue %s', venue_id)
+
   #----------------------------------------------------------------------------#
   # Controllers.
   #----------------------------------------------------------------------------#
 
   @app.route('/')
+  @responseCache.cached()
   def index():
     return render_template('pages/home.html')
 
@@ -62,75 +110,36 @@ def create_app(test_config=None):
   #  ----------------------------------------------------------------
 
   @app.route('/venues')
+  @responseCache.cached(lambda: ['venues'])
   def venues():
-    data = []
-    uniqueAreas =  db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-    for area in uniqueAreas:
-      venueTemp = []
-      venueInArea = Venue.query.filter_by(state=area[1]).filter_by(city=area[0]).all()
-      for venue in venueInArea:
-        upcomingShow = 0
-        for show in venue.shows:
-          if show.start_time > datetime.now():
-            upcomingShow +=1
-        venueTemp.append({"id": venue.id, "name": venue.name, "num_upcoming_shows": upcomingShow})
-      data.append({"city": area[0], "state": area[1], "venues": venueTemp})
-    return render_template('pages/venues.html', areas=data);
+    if wants_stream():
+      rows = queries.stream_query(queries.venue_areas_query(), app.config.get('STREAM_BATCH_SIZE', 1000))
+      return stream_template('pages/venues.html', areas=queries.stream_areas(rows), page=None)
+    try:
+      page = queries.venue_areas_page(**page_args())
+    except ValueError:
+      abort(400)
+    return render_template('pages/venues.html', areas=page.items, page=page)
 
   @app.route('/venues/search', methods=['POST'])
+  @replicas.read_only
   def search_venues():
     # case insensitive search of venues using city, state and name
-    searchTerm = request.form.get("search_term", "")
-    searchTerm = "%{}%".format(searchTerm)
-    searchVenues = Venue.query.filter( or_(Venue.name.ilike(searchTerm), Venue.city.ilike(searchTerm), Venue.state.ilike(searchTerm))).all()
-    searchVenueCount = len(searchVenues)
-    data = []
-    for searchVenue in searchVenues:
-      upcomingShow = 0
-      for show in searchVenue.shows:
-        if show.start_time > datetime.now():
-          upcomingShow +=1
-      data.append({"id": searchVenue.id, "name": searchVenue.name, "num_upcoming_shows": upcomingShow })
-
+    searchVenues = search.search_venues(request.form.get("search_term", ""))
+    data = [{"id": venue.id, "name": venue.name, "num_upcoming_shows": venue.upcoming_shows_count} for venue in searchVenues]
     response = {
-      "count": searchVenueCount,
+      "count": len(searchVenues),
       "data": data
     }
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
   @app.route('/venues/<int:venue_id>')
+  @responseCache.cached(lambda venue_id: ['venue:{0}'.format(venue_id)])
   def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    venueWithID = Venue.query.get(venue_id)
-    pastShows, pastShowCount, upcomingShows, upcomingShowCount = [], 0, [], 0
-    for show in venueWithID.shows:
-      if show.start_time > datetime.now():
-        showArtist = Artist.query.get(show.artist_id)
-        upcomingShows.append({"artist_id": showArtist.id, "artist_name": showArtist.name, "start_time": str(show.start_time)})
-        upcomingShowCount +=1
-      else:
-        showArtist = Artist.query.get(show.artist_id)
-        pastShows.append({"artist_id": showArtist.id, "artist_name": showArtist.name, "start_time": str(show.start_time)})
-        pastShowCount +=1
-      pastShows, pastShowCount, upcomingShows, upcomingShowCount = [], 0, [], 0
-    venueGenres = str(''.join(venueWithID.genres)).strip('\{\}').split(",")
-    data = {
-      "id": venueWithID.id,
-      "name": venueWithID.name,
-      "genres": venueGenres,
-      "address": venueWithID.address,
-      "city": venueWithID.city,
-      "state": venueWithID.state,
-      "phone": venueWithID.phone,
-      "facebook_link": venueWithID.facebook_link,
-      "website_link": venueWithID.website_link,
-      "image_link": venueWithID.image_link,
-      "seeking_talent": venueWithID.seeking_talent,
-      "past_shows": pastShows,
-      "upcoming_shows": upcomingShows,
-      "past_shows_count": pastShowCount,
-      "upcoming_shows_count": upcomingShowCount,
-    }
+    data = queries.venue_detail(venue_id)
+    if data is None:
+      abort(404)
     return render_template('pages/show_venue.html', venue=data)
 
   #  Create Venue
@@ -146,17 +155,14 @@ def create_app(test_config=None):
     # called upon submitting the new venue listing form
     form = VenueForm()
     error = False
+    venueExist = False
     if form.validate_on_submit():
       try:
-        venueExist = Venue.query.filter_by(name=request.form['name']).scalar()
-        if venueExist:
-          pass
+        if request.form.get("seeking_talent") == 'y':
+          seeking_talent = True
         else:
-          if request.form.get("seeking_talent") == 'y':
-            seeking_talent = True
-          else:
-            seeking_talent = False  
-          venue = Venue(
+          seeking_talent = False
+        venueId = queries.insert_unique(Venue, dict(
           name = request.form['name'],
           city = request.form['city'],
           state = request.form['state'],
@@ -167,10 +173,12 @@ def create_app(test_config=None):
           website_link = request.form['website_link'],
           image_link = request.form['image_link'],
           seeking_talent = seeking_talent,
-          )
-          db.session.add(venue)
+          **geo.coordinates(request.form['city'], request.form['state'])
+        ))
+        if venueId is None:
+          venueExist = True
+        else:
           db.session.commit()
-          data = Venue.query.all()[-1]
       except:
         error =  True
         db.session.rollback()
@@ -185,7 +193,8 @@ def create_app(test_config=None):
           return render_template('forms/new_venue.html', form=form)
         else:
           db.session.close()
-          flash('Venue ' + data.name + ' was successfully listed!')
+          venue_changed(venueId)
+          flash('Venue ' + request.form['name'] + ' was successfully listed!')
           return render_template('pages/home.html')
     else:
         flash_errors(form)
@@ -193,84 +202,59 @@ def create_app(test_config=None):
 
   @app.route('/venues/<venue_id>', methods=['DELETE'])
   def delete_venue(venue_id):
+    deleted = False
     try:
       venueWithID = Venue.query.get(venue_id)
-      for show in venueWithID.shows:
-        db.session.delete(show)
-      
+      artistIds = queries.show_partners(Show.venue_id, Show.artist_id, venueWithID.id)
+      Show.query.filter_by(venue_id=venueWithID.id).delete(synchronize_session=False)
+      ShowArchive.query.filter_by(venue_id=venueWithID.id).delete(synchronize_session=False)
       db.session.delete(venueWithID)
+      queries.refresh_upcoming_counts(venue_ids=[], artist_ids=artistIds)
       db.session.commit()
+      deleted = True
     except:
       db.session.rollback()
       print(sys.exc_info())
     finally:
       db.session.close()
+      if deleted:
+        venue_changed(venue_id, artistIds, deleted=True)
       return jsonify({'success': True})
 
   #  Artists
   #  ----------------------------------------------------------------
   @app.route('/artists')
+  @responseCache.cached(lambda: ['artists'])
   def artists():
-    artists = Artist.query.all()
-    data = []
-    for artist in artists:
-      data.append({"id": artist.id, "name": artist.name})
-    return render_template('pages/artists.html', artists=data)
+    if wants_stream():
+      rows = queries.stream_query(db.session.query(Artist.id, Artist.name).order_by(Artist.id),
+                                  app.config.get('STREAM_BATCH_SIZE', 1000))
+      return stream_template('pages/artists.html', artists=rows, page=None)
+    try:
+      page = queries.artists_page(**page_args())
+    except ValueError:
+      abort(400)
+    data = [{"id": artist.id, "name": artist.name} for artist in page.items]
+    return render_template('pages/artists.html', artists=data, page=page)
 
   @app.route('/artists/search', methods=['POST'])
+  @replicas.read_only
   def search_artists():
-    # case-insensitive search 
-    searchTerm = request.form.get("search_term", "")
-    searchTerm = "%{}%".format(searchTerm)
-    searchArtists = Artist.query.filter(or_(Artist.name.ilike(searchTerm), Artist.city.ilike(searchTerm), Artist.state.ilike(searchTerm))).all()
-    searchArtistCount = len(searchArtists)
-    data = []
-    upcoming_shows = 0
-    for searchArtist in searchArtists:
-      for show in searchArtist.shows:
-        if show.start_time > datetime.now():
-          upcoming_shows += 1
-      upcoming_shows = 0
-      data.append({"id": searchArtist.id, "name": searchArtist.name, "num_upcoming_shows": upcoming_shows})
-
-    response={
-      "count": searchArtistCount,
+    # case-insensitive search of artists using city, state and name
+    searchArtists = search.search_artists(request.form.get("search_term", ""))
+    data = [{"id": artist.id, "name": artist.name, "num_upcoming_shows": artist.upcoming_shows_count} for artist in searchArtists]
+    response = {
+      "count": len(searchArtists),
       "data": data,
     }
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
   @app.route('/artists/<int:artist_id>')
+  @responseCache.cached(lambda artist_id: ['artist:{0}'.format(artist_id)])
   def show_artist(artist_id):
-    artistWithID = Artist.query.get(artist_id)
-    print(artistWithID.name)
-    pastShows, pastShowCount, upcomingShows, upcomingShowCount = [], 0, [], 0
-    for show in artistWithID.shows:
-      if show.start_time > datetime.now():
-        showVenue = Venue.query.get(show.venue_id)
-        upcomingShows.append({"venue_id": showVenue.id, "venue_name": showVenue.name, "start_time": str(show.start_time)})
-        upcomingShowCount +=1
-      else:
-        showVenue = Venue.query.get(show.venue_id)
-        pastShows.append({"venue_id": showVenue.id, "venue_name": showVenue.name, "start_time": str(show.start_time)})
-        pastShowCount +=1
-      pastShows, pastShowCount, upcomingShows, upcomingShowCount = [], 0, [], 0
-    artistGenres = str(''.join(artistWithID.genres)).strip('\{\}').split(",")
-    data = {
-      "id": artistWithID.id,
-      "name": artistWithID.name,
-      "genres": artistGenres,
-      "city": artistWithID.city,
-      "state": artistWithID.state,
-      "phone": artistWithID.phone,
-      "facebook_link": artistWithID.facebook_link,
-      "website_link": artistWithID.website_link,
-      "image_link": artistWithID.image_link,
-      "seeking_venue": artistWithID.seeking_venue,
-      "past_shows": pastShows,
-      "upcoming_shows": upcomingShows,
-      "past_shows_count": pastShowCount,
-      "upcoming_shows_count": upcomingShowCount,
-    }
+    data = queries.artist_detail(artist_id)
+    if data is None:
+      abort(404)
     return render_template('pages/show_artist.html', artist=data)
 
   #  Update
@@ -285,6 +269,7 @@ def create_app(test_config=None):
   def edit_artist_submission(artist_id):
     form = ArtistForm()
     error = False
+    artistExist = False
     existArtist = Artist.query.get(artist_id)
     if form.validate_on_submit():
       try:
@@ -301,19 +286,29 @@ def create_app(test_config=None):
           existArtist.seeking_venue = True
         else:
           existArtist.seeking_venue = False
+        venueIds = queries.show_partners(Show.artist_id, Show.venue_id, artist_id)
         db.session.commit()
+      except IntegrityError:
+        # the unique lower(name) index: another artist has this name
+        artistExist = True
+        db.session.rollback()
       except:
         error = True
-        # db.session.rollback()
+        db.session.rollback()
         print(sys.exc_info())
       finally:
-        if error:
+        if artistExist:
+          flash('Artist with name: \" ' + request.form['name'] + '\" already exists.')
+          db.session.close()
+          return render_template('forms/edit_artist.html', form=form, artist=Artist.query.get(artist_id))
+        elif error:
           flash('Artist  ' + existArtist.name + ' record is not edited')
           db.session.close()
           return render_template('forms/edit_artist.html', form=form, artist=existArtist) 
         else:
           flash('Artist  ' + existArtist.name + ' has been edited successfully')
           db.session.close()
+          artist_changed(artist_id, venueIds)
           artist = Artist.query.get(artist_id)
           print(artist_id)          
           return redirect(url_for('show_artist', artist_id=artist_id))
@@ -331,6 +326,7 @@ def create_app(test_config=None):
   def edit_venue_submission(venue_id):
     form = VenueForm()
     error = False
+    venueExist = False
     existVenue = Venue.query.get(venue_id)
     if form.validate_on_submit():
       try:
@@ -343,23 +339,35 @@ def create_app(test_config=None):
         existVenue.facebook_link = request.form.get("facebook_link")
         existVenue.website_link = request.form.get("website_link")
         existVenue.image_link = request.form.get("image_link")
+        point = geo.coordinates(existVenue.city, existVenue.state)
+        existVenue.latitude, existVenue.longitude = point['latitude'], point['longitude']
         if request.form.get("seeking_talent") == 'y':
           existVenue.seeking_talent = True
         else:
           existVenue.seeking_talent = False
+        artistIds = queries.show_partners(Show.venue_id, Show.artist_id, venue_id)
         db.session.commit()
+      except IntegrityError:
+        # the unique lower(name) index: another venue has this name
+        venueExist = True
+        db.session.rollback()
       except:
         error = True
         db.session.rollback()
         print(sys.exc_info())
       finally:
-        if error:
+        if venueExist:
+          flash('Venue with name: \" ' + request.form['name'] + '\" already exists.')
+          db.session.close()
+          return render_template('forms/edit_venue.html', form=form, venue=Venue.query.get(venue_id))
+        elif error:
           flash('Venue ' + existVenue.name + ' record is not edited')
           db.session.close()
           return render_template('forms/edit_venue.html', form=form, venue=existVenue) 
         else:
           flash('Venue  ' + existVenue.name + ' has been edited successfully')
           db.session.close()
+          venue_changed(venue_id, artistIds)
           return redirect(url_for('show_venue', venue_id=venue_id))
     else:
       flash_errors(form)
@@ -379,17 +387,14 @@ def create_app(test_config=None):
     # called upon submitting the new artist listing form
     form = ArtistForm()
     error = False
+    artistExist = False
     if form.validate_on_submit():
       try:
-        artistExist = Artist.query.filter_by(name=request.form['name']).scalar()
-        if artistExist:
-          pass
+        if request.form.get("seeking_venue") == 'y':
+          seeking_venue = True
         else:
-          if request.form.get("seeking_venue") == 'y':
-            seeking_venue = True
-          else:
-            seeking_venue = False  
-          artist = Artist(
+          seeking_venue = False
+        artistId = queries.insert_unique(Artist, dict(
           name = request.form['name'],
           city = request.form['city'],
           state = request.form['state'],
@@ -399,10 +404,11 @@ def create_app(test_config=None):
           website_link = request.form['website_link'],
           image_link = request.form['image_link'],
           seeking_venue = seeking_venue,
-          )
-          db.session.add(artist)
+        ))
+        if artistId is None:
+          artistExist = True
+        else:
           db.session.commit()
-          data = Artist.query.all()[-1]
       except:
         error =  True
         db.session.rollback()
@@ -417,7 +423,8 @@ def create_app(test_config=None):
           return render_template('forms/new_artist.html', form=form)
         else:
           db.session.close()
-          flash('Artist ' + data.name + ' was successfully listed!')
+          artist_changed(artistId)
+          flash('Artist ' + request.form['name'] + ' was successfully listed!')
           return render_template('pages/home.html')
     else:
         flash_errors(form)
@@ -425,18 +432,23 @@ def create_app(test_config=None):
 
   @app.route('/artists/<artist_id>', methods=['DELETE'])
   def delete_artist(artist_id):
+    deleted = False
     try:
       artistWithID = Artist.query.get(artist_id)
-      for show in artistWithID.shows:
-        db.session.delete(show)
-      
+      venueIds = queries.show_partners(Show.artist_id, Show.venue_id, artistWithID.id)
+      Show.query.filter_by(artist_id=artistWithID.id).delete(synchronize_session=False)
+      ShowArchive.query.filter_by(artist_id=artistWithID.id).delete(synchronize_session=False)
       db.session.delete(artistWithID)
+      queries.refresh_upcoming_counts(venue_ids=venueIds, artist_ids=[])
       db.session.commit()
+      deleted = True
     except:
       db.session.rollback()
       print(sys.exc_info())
     finally:
       db.session.close()
+      if deleted:
+        artist_changed(artist_id, venueIds, deleted=True)
       return jsonify({'success': True})
 
   #  ----------------------------------------------------------------
@@ -444,21 +456,17 @@ def create_app(test_config=None):
   #  ----------------------------------------------------------------
 
   @app.route('/shows')
+  @responseCache.cached(lambda: ['shows'])
   def shows():
-    upcomingShows = Show.query.filter(Show.start_time > datetime.now()).all()
-    data = []
-    for show in upcomingShows:
-      showVenue = Venue.query.get(show.venue_id)
-      showArtist= Artist.query.get(show.artist_id)
-      data.append({
-      "venue_id": showVenue.id,
-      "venue_name": showVenue.name,
-      "artist_id":showArtist.id,
-      "artist_name": showArtist.name,
-      "artist_image_link": showArtist.image_link,
-      "start_time": str(show.start_time)
-      })
-    return render_template('pages/shows.html', shows=data)
+    if wants_stream():
+      rows = queries.stream_query(queries.upcoming_shows_query().order_by(Show.start_time, Show.id),
+                                  app.config.get('STREAM_BATCH_SIZE', 1000))
+      return stream_template('pages/shows.html', shows=rows, page=None)
+    try:
+      page = queries.upcoming_shows_page(**page_args())
+    except ValueError:
+      abort(400)
+    return render_template('pages/shows.html', shows=page.items, page=page)
 
   @app.route('/shows/create')
   def create_shows():
@@ -470,44 +478,48 @@ def create_app(test_config=None):
   def create_show_submission():
     form = ShowForm()
     if form.validate_on_submit():
-      error = False
+      # the same existence and double-booking checks as batch scheduling
+      row = {'artist_id': request.form['artist_id'], 'venue_id': request.form['venue_id'],
+             'start_time': form.start_time.data}
       try:
-        artistid = Artist.query.filter_by(id=request.form['artist_id']).scalar()
-        venueid = Venue.query.filter_by(id=request.form['venue_id']).scalar()
-        if not venueid:
-          pass
-        elif not artistid:
-          pass
-        else:
-          show = Show(
-          artist_id = request.form['artist_id'],
-          venue_id = request.form['venue_id'],
-          start_time = request.form['start_time']
-          )
-          db.session.add(show)
-          db.session.commit()
+        created, errors = scheduling.schedule_shows([(1, row)])
+        if errors:
+          db.session.rollback()
+          flash(errors[0][1])
+          return render_template('forms/new_show.html', form=form)
+        db.session.commit()
       except:
-        error = True
         db.session.rollback()
         print(sys.exc_info())
-      finally:
-        if not venueid:
-          flash('Venue with ID ' + request.form['venue_id'] + ' does not exist.')
-          return render_template('forms/new_show.html', form=form)
-        elif not artistid:
-          flash('Artist with ID ' + request.form['artist_id'] + ' does not exist.')
-          return render_template('forms/new_show.html', form=form)
-        elif error:
-          db.session.close()
-          flash('Show was not successfully listed!')
-          return render_template('forms/new_show.html', form=form)
-        else:
-          flash('Show was successfully listed!')
-          return render_template('pages/home.html')
+        db.session.close()
+        flash('Show was not successfully listed!')
+        return render_template('forms/new_show.html', form=form)
+      show_changed(created[0]['venue_id'], created[0]['artist_id'])
+      flash('Show was successfully listed!')
+      return render_template('pages/home.html')
     else:
       flash_errors(form)
       return render_template('forms/new_show.html', form=form)
 
+  @app.route('/cache/stats')
+  def cache_stats():
+    return jsonify(responseCache.stats())
+
+  @app.route('/pool/stats')
+  def pool_stats():
+    return jsonify(poolStats.stats())
+
+  @app.route('/replicas/status')
+  def replica_status():
+    return jsonify(replicas.status())
+
+  @app.route('/debug/sql')
+  def sql_profile():
+    # recent requests with their query counts and repeated statements
+    if not app.debug:
+      abort(404)
+    return jsonify(sqlProfiler.recent())
+
   @app.errorhandler(404)
   def not_found_error(error):
       return render_template('errors/404.html'), 404
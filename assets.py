@@ -0,0 +1,270 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+from flask import current_app, request, send_from_directory, url_for, abort
+from flask_script import Manager
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted static bundles.
+#
+# "manage.py assets build" concatenates and minifies the stylesheets and scripts
+# the layout loads into bundles, copies the other files in `fingerprinted`, and
+# writes everything to static/dist under content-hashed names with precompressed
+# .gz (and .br, when brotli is installed) siblings, plus a manifest. The app reads
+# the manifest once at startup; asset_url() then resolves a static filename or a
+# bundle name to its hashed URL, served with a year-long immutable Cache-Control.
+# Without a build (or with sources newer than the manifest) the source files are
+# served instead, so development needs no build step.
+
+log = logging.getLogger(__name__)
+
+AssetCommand = Manager(usage='Build the fingerprinted static bundles')
+
+distDirectory = 'dist'
+manifestName = 'manifest.json'
+
+# bundle name -> source files, relative to static/, in load order
+bundles = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # deferred, after jQuery
+    'main.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# files served on their own, fingerprinted but not bundled
+fingerprinted = [
+    'img/front-splash.jpg',
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/respond-1.4.2.min.js',
+]
+
+compressedTypes = ('.css', '.js', '.svg', '.json')
+cssUrl = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+#----------------------------------------------------------------------------#
+# Minification.
+#----------------------------------------------------------------------------#
+
+def minify_css(text):
+    # drops comments (except /*! licence headers) and the whitespace around
+    # punctuation; selectors and values are left alone
+    text = re.sub(r'/\*(?!!).*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # line-level only: indentation, blank lines and whole-line // comments. A
+    # tokenizing minifier would do better, but the unminified scripts are small
+    if '`' in text:
+        return text
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def rebase_urls(text, source, target):
+    # keeps relative url()s pointing at the same file once the stylesheet moves
+    # from static/<source> to static/<target>
+    sourceDir = os.path.dirname(source)
+    targetDir = os.path.dirname(target)
+
+    def _rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', url):
+            return match.group(0)
+        path, hashMark, fragment = url.partition('#')
+        path, questionMark, query = path.partition('?')
+        path = os.path.relpath(os.path.normpath(os.path.join(sourceDir, path)), targetDir).replace(os.sep, '/')
+        return 'url({0}{1}{2}{3}{4}{5}{0})'.format(quote, path, questionMark, query, hashMark, fragment)
+
+    return cssUrl.sub(_rebase, text)
+
+
+def bundle(staticFolder, name):
+    # the minified contents of a bundle as bytes
+    parts = []
+    for source in bundles[name]:
+        with open(os.path.join(staticFolder, source), encoding='utf-8') as stream:
+            text = stream.read()
+        if name.endswith('.css'):
+            parts.append(rebase_urls(text if source.endswith('.min.css') else minify_css(text),
+                                     source, os.path.join(distDirectory, name)))
+        else:
+            parts.append(text if source.endswith('.min.js') else minify_js(text))
+    # a script that does not end its last statement must not run into the next
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(parts).encode('utf-8')
+
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+def hashed_name(name, content):
+    base, extension = os.path.splitext(name)
+    return '{0}.{1}{2}'.format(base, hashlib.sha256(content).hexdigest()[:12], extension)
+
+
+def write_asset(distFolder, name, content):
+    # writes content under its hashed name with compressed siblings; returns the
+    # hashed name, relative to distFolder
+    hashed = hashed_name(name, content)
+    path = os.path.join(distFolder, hashed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as stream:
+        stream.write(content)
+    if name.endswith(compressedTypes):
+        with open(path + '.gz', 'wb') as stream:
+            stream.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as stream:
+                stream.write(brotli.compress(content, quality=11))
+    return hashed
+
+
+def read_manifest(distFolder):
+    try:
+        with open(os.path.join(distFolder, manifestName), encoding='utf-8') as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_assets(staticFolder):
+    # builds every bundle and fingerprinted file and returns the new manifest.
+    # Files of the previous build are kept so cached pages that still point at
+    # them keep working; anything older is removed
+    distFolder = os.path.join(staticFolder, distDirectory)
+    previous = read_manifest(distFolder)
+    manifest = {}
+    for name in bundles:
+        manifest[name] = write_asset(distFolder, name, bundle(staticFolder, name))
+    for name in fingerprinted:
+        with open(os.path.join(staticFolder, name), 'rb') as stream:
+            manifest[name] = write_asset(distFolder, name, stream.read())
+    with open(os.path.join(distFolder, manifestName), 'w', encoding='utf-8') as stream:
+        json.dump(manifest, stream, indent=2, sort_keys=True)
+    keep = {manifestName}
+    for hashed in list(manifest.values()) + list(previous.values()):
+        keep.update(hashed + suffix for suffix in ('', '.gz', '.br'))
+    for directory, _, files in os.walk(distFolder):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            if os.path.relpath(path, distFolder).replace(os.sep, '/') not in keep:
+                os.remove(path)
+    return manifest
+
+
+def source_files(name):
+    return bundles.get(name, [name])
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+class Assets(object):
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.maxAge = 365 * 24 * 3600
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.distFolder = os.path.join(app.static_folder, distDirectory)
+        self.maxAge = app.config.get('ASSETS_MAX_AGE', self.maxAge)
+        self.manifest = self.load(app.static_folder) if app.config.get('ASSETS_BUNDLED', True) else {}
+        app.add_url_rule(app.static_url_path + '/' + distDirectory + '/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.jinja_env.globals['asset_urls'] = self.asset_urls
+        app.extensions['assets'] = self
+
+    def load(self, staticFolder):
+        # the manifest, unless a source changed after it was built
+        manifest = read_manifest(self.distFolder)
+        if not manifest:
+            return {}
+        built = os.path.getmtime(os.path.join(self.distFolder, manifestName))
+        for name in manifest:
+            for source in source_files(name):
+                if os.path.getmtime(os.path.join(staticFolder, source)) > built:
+                    log.warning('%s changed since the last "manage.py assets build", serving unbundled assets', source)
+                    return {}
+        return manifest
+
+    def asset_url(self, filename):
+        # url_for('static', filename=...) for the fingerprinted copy when there is one
+        hashed = self.manifest.get(filename)
+        if hashed:
+            return url_for('assets', filename=hashed)
+        return url_for('static', filename=filename)
+
+    def asset_urls(self, name):
+        # the URLs to load for a bundle: the bundle itself once built, its sources before
+        if name in self.manifest:
+            return [self.asset_url(name)]
+        return [url_for('static', filename=source) for source in source_files(name)]
+
+    def serve(self, filename):
+        if filename == manifestName:
+            abort(404)
+        accepted = request.headers.get('Accept-Encoding', '')
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding, suffix = None, ''
+        for candidate, extension in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in accepted and os.path.isfile(os.path.join(self.distFolder, filename + extension)):
+                encoding, suffix = candidate, extension
+                break
+        response = send_from_directory(self.distFolder, filename + suffix, mimetype=mimetype,
+                                       cache_timeout=self.maxAge)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(compressedTypes):
+            response.vary.add('Accept-Encoding')
+        # the name changes with the content, so browsers never need to revalidate
+        response.headers['Cache-Control'] = 'public, max-age={0}, immutable'.format(self.maxAge)
+        return response
+
+
+assets = Assets()
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@AssetCommand.option('--quiet', dest='quiet', action='store_true', default=False)
+def build(quiet):
+    """Bundle, minify, fingerprint and compress the static files into static/dist"""
+    manifest = build_assets(current_app.static_folder)
+    if not quiet:
+        for name, hashed in sorted(manifest.items()):
+            print('{0:<32} {1}/{2}'.format(name, distDirectory, hashed))
+    if brotli is None:
+        print('brotli is not installed, only .gz files were written', file=sys.stderr)
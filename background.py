@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from flask import current_app
+
+# In-memory indexes kept by each worker: the search trigrams, the type-ahead
+# prefixes and the venue proximity tree.
+#
+# An index is built by the first lookup (or the gunicorn warm-up) and rebuilt in a
+# background thread once it is older than its max-age setting, so writes served by
+# other workers or made from the CLI show up; the old index answers meanwhile. The
+# write views either invalidate() it, for a rebuild on the next lookup, or apply
+# their change to it with update().
+
+log = logging.getLogger(__name__)
+
+
+def cooperative(items, every=10000):
+    # yields the items, pausing every `every` of them so a long build in a
+    # background thread lets requests run: time.sleep(0) releases the GIL, and
+    # switches to other greenlets under gevent's monkey-patching
+    for i, item in enumerate(items, 1):
+        yield item
+        if not i % every:
+            time.sleep(0)
+
+
+class BackgroundIndex(object):
+
+    def __init__(self, name, build, maxAgeSetting):
+        # build() returns a new index and runs in an app context
+        self.name = name
+        self.build = build
+        self.maxAgeSetting = maxAgeSetting
+        self.lock = threading.Lock()
+        self.index = None
+        self.builtAt = 0.0
+        # bumped by invalidate(), so a rebuild that started before a write does not
+        # put back an index without it
+        self.generation = 0
+        self.rebuilding = False
+        # update() changes made while a rebuild runs, replayed on the new index
+        self.pending = []
+
+    def get(self):
+        current = self.index
+        if current is None:
+            with self.lock:
+                if self.index is None:
+                    self.index, self.builtAt = self.build(), time.time()
+                current = self.index
+        elif time.time() - self.builtAt > current_app.config.get(self.maxAgeSetting, 300):
+            self.refresh(current_app._get_current_object())
+        return current
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+            self.generation += 1
+
+    def update(self, apply):
+        # apply(index) changes the index in place; it runs under the lock, so it
+        # must not touch the database
+        with self.lock:
+            if self.index is None:
+                return
+            if self.rebuilding:
+                self.pending.append(apply)
+            apply(self.index)
+
+    def refresh(self, app):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+            startGeneration = self.generation
+        threading.Thread(target=self._rebuild, args=(app, startGeneration), daemon=True).start()
+
+    def _rebuild(self, app, startGeneration):
+        stale = None
+        try:
+            with app.app_context():
+                fresh = self.build()
+            with self.lock:
+                if self.generation == startGeneration:
+                    for apply in self.pending:
+                        apply(fresh)
+                    stale, self.index, self.builtAt = self.index, fresh, time.time()
+        except Exception:
+            log.exception('%s rebuild failed', self.name)
+            with self.lock:
+                # tried again after another max age
+                self.builtAt = time.time()
+        finally:
+            with self.lock:
+                self.rebuilding = False
+                self.pending = []
+        # freeing millions of keys takes a while; not while holding the lock
+        del stale
@@ -0,0 +1,683 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.request import urlopen
+import babel.dates
+import dateutil.parser
+from flask import current_app, render_template, before_render_template, template_rendered
+from flask_script import Manager
+from sqlalchemy import event, func
+from models import db, Venue, Artist, Show
+import queries
+import search as textSearch
+import dateformat
+import geo
+import scheduling
+import suggest as suggestions
+import assets as staticAssets
+from jinjacache import SharedBytecodeCache
+from cache import responseCache
+from forms import genreValues
+
+# Benchmarks seed synthetic rows, so point DATABASE_URL at a scratch database
+# before running them, e.g. "python manage.py bench venues".
+BenchCommand = Manager(usage='Run performance benchmarks against DATABASE_URL')
+
+states = ['AL', 'AZ', 'CA', 'CO', 'FL', 'GA', 'IL', 'MA', 'NY', 'OR', 'TX', 'WA']
+chunkSize = 10000
+
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+@contextmanager
+def count_queries():
+    stats = {'count': 0}
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        stats['count'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', _count)
+    try:
+        yield stats
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _count)
+
+
+def timed(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        with count_queries() as stats:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print('{0:<28} queries={1:<8} best={2:.4f}s median={3:.4f}s'.format(
+        label, stats['count'], timings[0], timings[len(timings) // 2]))
+
+
+def _insert(table, rows):
+    for i in range(0, len(rows), chunkSize):
+        db.session.execute(table.insert(), rows[i:i + chunkSize])
+    db.session.commit()
+
+
+def seed(venues=0, artists=0, shows=0, cities=500):
+    # tops the tables up to the requested sizes with synthetic rows
+    rng = random.Random(42)
+    venueCount = Venue.query.count()
+    artistCount = Artist.query.count()
+    showCount = Show.query.count()
+    if venueCount < venues:
+        _insert(Venue.__table__, [{
+            "name": "Bench Venue {0}".format(i),
+            "city": "City {0}".format(i % cities),
+            "state": states[i % len(states)],
+            "address": "{0} Main St".format(i),
+            "phone": "555-555-5555",
+            "genres": [genreValues[i % len(genreValues)], genreValues[i * 7 % len(genreValues)]],
+            # spread over the continental US for the proximity search
+            "latitude": rng.uniform(25.0, 49.0),
+            "longitude": rng.uniform(-124.0, -67.0),
+            "seeking_talent": False,
+        } for i in range(venueCount, venues)])
+    if artistCount < artists:
+        _insert(Artist.__table__, [{
+            "name": "Bench Artist {0}".format(i),
+            "city": "City {0}".format(i % cities),
+            "state": states[i % len(states)],
+            "phone": "555-555-5555",
+            "genres": [genreValues[i % len(genreValues)]],
+            "seeking_venue": False,
+        } for i in range(artistCount, artists)])
+    if showCount < shows:
+        venueIds = [row[0] for row in db.session.query(Venue.id)]
+        artistIds = [row[0] for row in db.session.query(Artist.id)]
+        now = datetime.now()
+        for start in range(showCount, shows, chunkSize):
+            _insert(Show.__table__, [{
+                "venue_id": rng.choice(venueIds),
+                "artist_id": rng.choice(artistIds),
+                "start_time": now + timedelta(hours=rng.randint(-24 * 730, 24 * 365)),
+            } for _ in range(start, min(start + chunkSize, shows))])
+        queries.refresh_upcoming_counts()
+        db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+
+def _legacy_venue_areas():
+    # the per-area / per-venue lazy loading /venues used before queries.venue_areas
+    data = []
+    uniqueAreas = db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
+    for area in uniqueAreas:
+        venueTemp = []
+        for venue in Venue.query.filter_by(state=area[1]).filter_by(city=area[0]).all():
+            upcomingShow = 0
+            for show in venue.shows:
+                if show.start_time > datetime.now():
+                    upcomingShow += 1
+            venueTemp.append({"id": venue.id, "name": venue.name, "num_upcoming_shows": upcomingShow})
+        data.append({"city": area[0], "state": area[1], "venues": venueTemp})
+    return data
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=10000)
+@BenchCommand.option('--shows', dest='shows', type=int, default=1000000)
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=3)
+@BenchCommand.option('--skip-legacy', dest='skip_legacy', action='store_true', default=False)
+def venues(venues, shows, repeat, skip_legacy):
+    """Compare the /venues listing queries"""
+    seed(venues=venues, artists=1000, shows=shows)
+    if not skip_legacy:
+        timed('legacy (N+1)', _legacy_venue_areas, repeat)
+    timed('aggregated', queries.venue_areas, repeat)
+
+
+def _legacy_venue_detail(venue_id):
+    # the per-show Artist.query.get loop show_venue used before queries.venue_detail
+    pastShows, upcomingShows = [], []
+    for show in Venue.query.get(venue_id).shows:
+        showArtist = Artist.query.get(show.artist_id)
+        entry = {"artist_id": showArtist.id, "artist_name": showArtist.name, "start_time": str(show.start_time)}
+        if show.start_time > datetime.now():
+            upcomingShows.append(entry)
+        else:
+            pastShows.append(entry)
+    return pastShows, upcomingShows
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=100)
+@BenchCommand.option('--shows', dest='shows', type=int, default=200000)
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=3)
+def details(venues, shows, repeat):
+    """Compare the show_venue page queries on the busiest venue"""
+    seed(venues=venues, artists=5000, shows=shows)
+    venueId = db.session.query(Show.venue_id).group_by(Show.venue_id) \
+        .order_by(func.count(Show.id).desc()).limit(1).scalar()
+    print('venue {0} has {1} shows'.format(venueId, Show.query.filter_by(venue_id=venueId).count()))
+    timed('legacy (per-show get)', lambda: _legacy_venue_detail(venueId), repeat)
+    timed('joined', lambda: queries.venue_detail(venueId), repeat)
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=100000)
+@BenchCommand.option('--term', dest='terms', action='append')
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=5)
+def search(venues, terms, repeat):
+    """Compare venue search backends with the plain ILIKE scan"""
+    seed(venues=venues)
+    for term in terms or ['Venue 4242', 'City 17', 'NY', 'zzz']:
+        print('term "{0}" ({1} matches)'.format(term, textSearch.ilike_query(Venue, term).count()))
+        timed('  ILIKE scan', lambda: textSearch.ilike_query(Venue, term).all(), repeat)
+        if db.engine.dialect.name == 'postgresql':
+            timed('  pg_trgm ranked', lambda: textSearch.search(Venue, term), repeat)
+        textSearch.invalidate(Venue)
+        timed('  index build', lambda: textSearch.get_index(Venue), 1)
+        timed('  in-memory index', lambda: textSearch.get_index(Venue).search(term), repeat)
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        for node in _plan_nodes(child):
+            yield node
+
+
+def explain(query):
+    # EXPLAIN (FORMAT JSON) of an ORM query, executed with its bound parameters
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    result = db.session.connection().execute('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def view_queries():
+    # the queries each view issues, with representative arguments
+    venueId = db.session.query(Venue.id).order_by(Venue.id.desc()).limit(1).scalar()
+    artistId = db.session.query(Artist.id).order_by(Artist.id.desc()).limit(1).scalar()
+    monthStart = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    venueCursor = queries.encode_cursor(db.session.query(Venue.state, Venue.city, Venue.id)
+                                        .filter(Venue.id == venueId).one())
+    return [
+        ('venues', queries.keyset_query(queries.venue_areas_query(), [Venue.state, Venue.city, Venue.id])),
+        ('venues?after', queries.keyset_query(queries.venue_areas_query(), [Venue.state, Venue.city, Venue.id],
+                                              after=venueCursor)),
+        ('artists', queries.keyset_query(db.session.query(Artist.id, Artist.name), [Artist.id])),
+        ('shows', queries.keyset_query(queries.upcoming_shows_query(), [Show.start_time, Show.id])),
+        ('show_venue', Venue.query.filter(Venue.id == venueId)),
+        ('show_venue shows', queries.venue_shows_query(venueId)),
+        ('show_artist', Artist.query.filter(Artist.id == artistId)),
+        ('show_artist shows', queries.artist_shows_query(artistId)),
+        ('search_venues', textSearch.ranked_query(Venue, 'Venue 4242')),
+        ('search_artists', textSearch.ranked_query(Artist, 'Artist 4242')),
+        ('venue name check', Venue.query.filter(func.lower(Venue.name) == 'bench venue 4242')),
+        ('artist name check', Artist.query.filter(func.lower(Artist.name) == 'bench artist 4242')),
+        ('calendar month', queries.keyset_query(
+            queries.calendar_query(monthStart, monthStart + timedelta(days=31)),
+            [queries.allShows.c.start_time, queries.allShows.c.id])),
+        ('calendar city month', queries.calendar_query(monthStart, monthStart + timedelta(days=31),
+                                                       city='City 17', state=states[17 % len(states)])
+            .order_by(queries.allShows.c.start_time, queries.allShows.c.id)),
+        ('venues by genre', queries.keyset_query(queries.genre_query(Venue, 'Jazz'), [Venue.id])),
+        ('artists by genre', queries.keyset_query(queries.genre_query(Artist, 'Jazz'), [Artist.id])),
+        ('delete_venue partners', queries.show_partners_query(Show.venue_id, Show.artist_id, venueId)),
+    ]
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=10000)
+@BenchCommand.option('--artists', dest='artists', type=int, default=10000)
+@BenchCommand.option('--shows', dest='shows', type=int, default=1000000)
+def plans(venues, artists, shows):
+    """Fail if any view query plans a sequential scan (PostgreSQL only)"""
+    if db.engine.dialect.name != 'postgresql':
+        sys.exit('plans needs a PostgreSQL DATABASE_URL')
+    seed(venues=venues, artists=artists, shows=shows)
+    db.session.execute('ANALYZE')
+    failures = []
+    for label, query in view_queries():
+        seqScans = [node['Relation Name'] for node in _plan_nodes(explain(query))
+                    if node['Node Type'] == 'Seq Scan']
+        print('{0:<24} {1}'.format(label, 'seq scan on ' + ', '.join(seqScans) if seqScans else 'ok'))
+        if seqScans:
+            failures.append(label)
+    if failures:
+        sys.exit('sequential scans planned for: ' + ', '.join(failures))
+
+
+def _legacy_create_venue(name):
+    # add, commit, then read the whole table back for the new row
+    db.session.add(Venue(name=name, city='Bench', state='NY'))
+    db.session.commit()
+    return Venue.query.all()[-1]
+
+
+def _create_venue(name):
+    venueId = queries.insert_unique(Venue, dict(name=name, city='Bench', state='NY'))
+    db.session.commit()
+    return venueId
+
+
+@BenchCommand.option('--sizes', dest='sizes', default='1000,10000,100000')
+@BenchCommand.option('--creates', dest='creates', type=int, default=50)
+def creates(sizes, creates):
+    """Measure venue create latency as the table grows"""
+    for size in [int(size) for size in sizes.split(',')]:
+        seed(venues=size)
+        print('{0} venues'.format(Venue.query.count()))
+        for label, create in [('  legacy (all()[-1])', _legacy_create_venue), ('  insert returning', _create_venue)]:
+            timings = []
+            for _ in range(creates):
+                name = 'Bench Create {0}'.format(uuid.uuid4().hex)
+                start = time.perf_counter()
+                create(name)
+                timings.append(time.perf_counter() - start)
+                db.session.expunge_all()
+            timings.sort()
+            print('{0:<28} median={1:.4f}s p95={2:.4f}s'.format(
+                label, timings[len(timings) // 2], timings[int(len(timings) * 0.95)]))
+
+
+def _legacy_schedule(rows):
+    # create_show_submission before scheduling: two existence checks per show, no overlap check
+    for row in rows:
+        artist = Artist.query.filter_by(id=row['artist_id']).scalar()
+        venue = Venue.query.filter_by(id=row['venue_id']).scalar()
+        if artist and venue:
+            db.session.add(Show(**row))
+            db.session.flush()
+            queries.refresh_upcoming_counts(venue_ids=[venue.id], artist_ids=[artist.id])
+    db.session.rollback()
+
+
+def _schedule(rows):
+    created, errors = scheduling.schedule_shows(
+        enumerate([dict(row, start_time=row['start_time'].strftime('%Y-%m-%d %H:%M:%S')) for row in rows], 1))
+    assert len(created) == len(rows), errors
+    db.session.rollback()
+
+
+@BenchCommand.option('--tour', dest='tour', type=int, default=300)
+@BenchCommand.option('--shows', dest='shows', type=int, default=200000)
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=3)
+def schedule(tour, shows, repeat):
+    """Compare scheduling a tour show by show and as one checked batch"""
+    seed(venues=1000, artists=1000, shows=shows)
+    rng = random.Random(11)
+    venueIds = [row[0] for row in db.session.query(Venue.id)]
+    artistId = db.session.query(func.max(Artist.id)).scalar()
+    # a new artist's dates, a day apart after every seeded show
+    first = (db.session.query(func.max(Show.start_time)).scalar() or datetime.now()) + timedelta(days=1)
+    rows = [{'artist_id': artistId, 'venue_id': rng.choice(venueIds), 'start_time': first + timedelta(days=i)}
+            for i in range(tour)]
+    timed('show by show ({0})'.format(tour), lambda: _legacy_schedule(rows), repeat)
+    timed('batch ({0})'.format(tour), lambda: _schedule(rows), repeat)
+
+
+def _legacy_format_datetime(value, format='medium'):
+    # the filter before dateformat: views passed str(start_time) and it was parsed back
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+@BenchCommand.option('--count', dest='count', type=int, default=100000)
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=3)
+def datetime_filter(count, repeat):
+    """Compare the datetime Jinja filter implementations"""
+    rng = random.Random(42)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    # shows start on the hour, so a listing repeats start times
+    stamps = [now + timedelta(hours=rng.randint(-24 * 730, 24 * 365)) for _ in range(count)]
+    strings = [str(stamp) for stamp in stamps]
+    assert _legacy_format_datetime(strings[0], 'full') == dateformat.format_datetime(stamps[0], 'full')
+
+    def cold():
+        dateformat._format.cache_clear()
+        dateformat.compiled_pattern.cache_clear()
+        for stamp in stamps:
+            dateformat.format_datetime(stamp, 'full')
+
+    timed('legacy (parse + format)', lambda: [_legacy_format_datetime(value, 'full') for value in strings], repeat)
+    timed('precompiled, cold cache', cold, repeat)
+    timed('precompiled, second pass', lambda: [dateformat.format_datetime(stamp, 'full') for stamp in stamps], repeat)
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=100000)
+@BenchCommand.option('--shows', dest='shows', type=int, default=200000)
+@BenchCommand.option('--queries', dest='queries', type=int, default=200)
+@BenchCommand.option('--limit', dest='limit', type=int, default=10)
+def near(venues, shows, queries, limit):
+    """Compare nearest-venue lookups: linear scan vs KD-tree"""
+    seed(venues=venues, artists=1000, shows=shows)
+    rng = random.Random(7)
+    origins = [(rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)) for _ in range(queries)]
+    geo.invalidate()
+    timed('index build', geo.get_index, 1)
+    rows = db.session.query(Venue.id, Venue.latitude, Venue.longitude).filter(Venue.latitude.isnot(None)).all()
+    points = [(row.id, geo.to_vector(row.latitude, row.longitude)) for row in rows]
+    print('{0} geocoded venues, {1} queries, k={2}'.format(len(points), queries, limit))
+
+    def linear(origin):
+        vector = geo.to_vector(*origin)
+        return sorted((geo.squared_distance(point, vector), venueId) for venueId, point in points)[:limit]
+
+    def kdtree(origin):
+        neighbours = geo.get_index().nearest(geo.to_vector(*origin))
+        return [next(neighbours) for _ in range(min(limit, len(points)))]
+
+    assert linear(origins[0]) == kdtree(origins[0])
+    for label, search in [('  linear scan', linear), ('  kd-tree', kdtree),
+                          ('  kd-tree + upcoming filter', lambda origin: geo.nearest_venues(origin[0], origin[1], limit))]:
+        timings = []
+        for origin in origins:
+            start = time.perf_counter()
+            search(origin)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print('{0:<28} median={1:.5f}s p99={2:.5f}s'.format(
+            label, timings[len(timings) // 2], timings[int(len(timings) * 0.99)]))
+
+
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=20)
+def assets(repeat):
+    """Compare serving the layout's static files unbundled and as built bundles"""
+    manifest = staticAssets.build_assets(current_app.static_folder)
+    names = list(staticAssets.bundles) + staticAssets.fingerprinted
+    sources = ['/static/' + source for name in names for source in staticAssets.source_files(name)]
+    hashed = ['/static/{0}/{1}'.format(staticAssets.distDirectory, manifest[name]) for name in names]
+    client = current_app.test_client()
+    for label, urls in [('unbundled', sources), ('bundled + gzip', hashed)]:
+        timings = []
+        for _ in range(repeat):
+            sent = 0
+            start = time.perf_counter()
+            for url in urls:
+                response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+                sent += len(response.get_data())
+                response.close()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print('{0:<28} requests={1:<4} bytes={2:<9} median={3:.4f}s'.format(
+            label, len(urls), sent, timings[len(timings) // 2]))
+    # a repeat visit revalidates every unbundled file once its max-age runs out;
+    # immutable bundles are not requested again until the next build
+    print('{0:<28} unbundled={1} bundled=0'.format('repeat visit requests', len(sources)))
+
+
+@BenchCommand.option('--repeat', dest='repeat', type=int, default=10)
+def templates(repeat):
+    """Split page latency into template compile, bytecode load and render time"""
+    seed(venues=100, artists=100, shows=2000)
+    venueId = db.session.query(func.min(Venue.id)).scalar()
+    artistId = db.session.query(func.min(Artist.id)).scalar()
+    pages = ['/', '/venues', '/artists', '/shows', '/venues/{0}'.format(venueId), '/artists/{0}'.format(artistId),
+             '/venues/create', '/artists/create', '/shows/create', '/venues/{0}/edit'.format(venueId),
+             '/artists/{0}/edit'.format(artistId)]
+    app = current_app._get_current_object()
+    env = app.jinja_env
+    client = app.test_client()
+    renders = []
+
+    def _before(sender, template, context, **extra):
+        renders.append(time.perf_counter())
+
+    def _rendered(sender, template, context, **extra):
+        renders[-1] = time.perf_counter() - renders[-1]
+
+    def fetch(path, bytecodeCache, clear):
+        # seconds for the whole request and for rendering its template
+        env.bytecode_cache = bytecodeCache
+        if clear:
+            env.cache.clear()
+        start = time.perf_counter()
+        client.get(path).close()
+        return time.perf_counter() - start, renders[-1]
+
+    saved = env.bytecode_cache, responseCache.enabled
+    responseCache.enabled = False
+    before_render_template.connect(_before, app)
+    template_rendered.connect(_rendered, app)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            bytecodeCache = SharedBytecodeCache(directory)
+            print('{0:<20} {1:>10} {2:>10} {3:>10} {4:>10}'.format('page', 'compile', 'bytecode', 'warm', 'render'))
+            for path in pages:
+                fetch(path, bytecodeCache, True)
+                medians = []
+                for cache, clear in [(None, True), (bytecodeCache, True), (bytecodeCache, False)]:
+                    timings = sorted(fetch(path, cache, clear) for _ in range(repeat))
+                    medians.append(timings[len(timings) // 2])
+                print('{0:<20} {1:>9.2f}ms {2:>9.2f}ms {3:>9.2f}ms {4:>9.2f}ms'.format(
+                    path, medians[0][0] * 1000, medians[1][0] * 1000, medians[2][0] * 1000, medians[2][1] * 1000))
+    finally:
+        env.bytecode_cache, responseCache.enabled = saved
+        env.cache.clear()
+        before_render_template.disconnect(_before, app)
+        template_rendered.disconnect(_rendered, app)
+
+
+@BenchCommand.option('--venues', dest='venues', type=int, default=100000)
+def stream(venues):
+    """Compare rendering the whole venue list at once and streaming it"""
+    seed(venues=venues)
+    app = current_app._get_current_object()
+    client = app.test_client()
+
+    def rendered():
+        with app.test_request_context('/venues'):
+            return [render_template('pages/venues.html', areas=queries.venue_areas(), page=None)]
+
+    def streamed():
+        return client.get('/venues?limit=all', buffered=False).response
+
+    for label, render in [('render_template', rendered), ('stream_template', streamed)]:
+        db.session.expunge_all()
+        tracemalloc.start()
+        start = time.perf_counter()
+        chunks = iter(render())
+        size = len(next(chunks))
+        firstByte = time.perf_counter() - start
+        for chunk in chunks:
+            size += len(chunk)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('{0:<20} first byte={1:.4f}s total={2:.4f}s peak memory={3:.1f}MB size={4:.1f}MB'.format(
+            label, firstByte, total, peak / 1e6, size / 1e6))
+
+
+def _synthetic_names(count, rng):
+    # (kind, id, name, city, state) rows with two to four made-up words per name
+    syllables = ['ba', 'ro', 'ki', 'lu', 'ne', 'sa', 'to', 'mi', 'da', 'vo', 'ze', 'pa', 'gri', 'shu', 'el', 'on']
+    words = sorted({''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(5000)})
+    words += ['The', 'Blue', 'Club', 'Hall', 'Band', 'Lounge', 'Theatre', 'Quartet']
+    return [('venue' if i % 2 else 'artist', i, ' '.join(rng.choice(words).title() for _ in range(rng.randint(2, 4))),
+             'City {0}'.format(i % 5000), states[i % len(states)]) for i in range(count)]
+
+
+@BenchCommand.option('--names', dest='names', type=int, default=1000000)
+@BenchCommand.option('--queries', dest='queries', type=int, default=10000)
+@BenchCommand.option('--venues', dest='venues', type=int, default=100000)
+def suggest(names, queries, venues):
+    """Time /api/v1/suggest lookups on the prefix index against ILIKE prefix scans"""
+    rng = random.Random(11)
+    rows = _synthetic_names(names, rng)
+    start = time.perf_counter()
+    index = suggestions.PrefixIndex(rows)
+    built = time.perf_counter() - start
+    # built again under tracemalloc, which slows it down several times
+    del index
+    tracemalloc.start()
+    index = suggestions.PrefixIndex(rows)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{0} names, {1} keys: built in {2:.2f}s, {3:.0f}MB'.format(names, len(index), built, memory / 1e6))
+    words = [word for row in rng.sample(rows, queries) for word in row[2].split()]
+    prefixes = [rng.choice(words)[:rng.randint(1, 6)] for _ in range(queries)]
+
+    def percentiles(label, func, args):
+        timings = []
+        for arg in args:
+            start = time.perf_counter()
+            func(arg)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print('{0:<28} median={1:.3f}ms p99={2:.3f}ms max={3:.3f}ms'.format(
+            label, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000, timings[-1] * 1000))
+
+    percentiles('  prefix lookup', lambda prefix: index.search(prefix, 10), prefixes)
+    updates = rng.sample(rows, min(queries, 1000))
+    percentiles('  edit (remove + add)', lambda row: index.add(*row), updates)
+    percentiles('  delete', lambda row: index.remove(row[0], row[1]), updates)
+
+    seed(venues=venues)
+    print('{0} venues in the database'.format(Venue.query.count()))
+    suggestions.invalidate()
+    timed('  index build (database)', suggestions.get_index, 1)
+    client = current_app.test_client()
+    percentiles('  GET /api/v1/suggest', lambda prefix: client.get('/api/v1/suggest?q=' + prefix).close(),
+                prefixes[:1000])
+    percentiles('  ILIKE prefix scan', lambda prefix: Venue.query.filter(Venue.name.ilike(prefix + '%')).limit(10).all(),
+                prefixes[:100])
+
+
+startupScript = """
+import time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+app.test_client().get('/')
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def _import_times(stderr):
+    # (self microseconds, module) pairs from python -X importtime
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if line.startswith('import time:') and parts[0].split(':')[1].strip().isdigit():
+            yield int(parts[0].split(':')[1]), parts[2].strip()
+
+
+@BenchCommand.option('--runs', dest='runs', type=int, default=5)
+@BenchCommand.option('--top', dest='top', type=int, default=10)
+def startup(runs, top):
+    """Measure cold start: importing the app, and until the first response"""
+    imports, firsts = [], []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', startupScript], stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True)
+        imported, first = [float(value) for value in result.stdout.split()[-2:]]
+        imports.append(imported)
+        firsts.append(first)
+    imports.sort()
+    firsts.sort()
+    print('{0:<28} best={1:.4f}s median={2:.4f}s'.format('import + create_app', imports[0], imports[runs // 2]))
+    print('{0:<28} best={1:.4f}s median={2:.4f}s'.format('to first response', firsts[0], firsts[runs // 2]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], stderr=subprocess.PIPE,
+                            check=True, universal_newlines=True)
+    print('slowest imports (self time):')
+    for micros, module in sorted(_import_times(result.stderr), reverse=True)[:top]:
+        print('  {0:<40} {1:.1f}ms'.format(module, micros / 1000))
+
+
+def _fetch(url):
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def load_test(baseUrl, paths, concurrency, duration):
+    # keeps `concurrency` requests in flight for `duration` seconds
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(offset):
+        n = offset
+        while time.time() < deadline:
+            elapsed, ok = _fetch(baseUrl + paths[n % len(paths)])
+            n += 1
+            with lock:
+                timings.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'rps': len(timings) / duration,
+        'p50': timings[len(timings) // 2] if timings else 0.0,
+        'p99': timings[int(len(timings) * 0.99)] if timings else 0.0,
+        'errors': errors[0],
+    }
+
+
+def _start_server(mode, port, workers):
+    # gunicorn with the production config and the given worker class; the response
+    # cache is disabled so every request reaches the database
+    env = dict(os.environ, WORKER_CLASS=mode, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               CACHE_ENABLED='false')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'app:app'], env=env)
+    baseUrl = 'http://127.0.0.1:{0}'.format(port)
+    for _ in range(100):
+        if _fetch(baseUrl + '/')[1]:
+            return server, baseUrl
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit('gunicorn ({0}) did not start'.format(mode))
+
+
+@BenchCommand.option('--url', dest='url', default=None, help='load an already running server instead')
+@BenchCommand.option('--modes', dest='modes', default='sync,gevent')
+@BenchCommand.option('--paths', dest='paths', default='/venues,/artists,/shows,/api/v1/venues')
+@BenchCommand.option('--workers', dest='workers', type=int, default=2)
+@BenchCommand.option('--concurrency', dest='concurrency', type=int, default=50)
+@BenchCommand.option('--duration', dest='duration', type=int, default=15)
+@BenchCommand.option('--port', dest='port', type=int, default=8765)
+def load(url, modes, paths, workers, concurrency, duration, port):
+    """Compare requests/sec and p99 latency of the gunicorn worker classes"""
+    paths = paths.split(',')
+    targets = [(url, None)] if url else [(mode, mode) for mode in modes.split(',')]
+    for label, mode in targets:
+        server = None
+        baseUrl = url
+        if mode:
+            server, baseUrl = _start_server(mode, port, workers)
+        try:
+            stats = load_test(baseUrl, paths, concurrency, duration)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+        print('{0:<12} rps={1:<8.1f} p50={2:.4f}s p99={3:.4f}s errors={4}'.format(
+            label, stats['rps'], stats['p50'], stats['p99'], stats['errors']))
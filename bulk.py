@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from flask_script import Manager
+from sqlalchemy import func
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+from cache import responseCache
+from customValidator import validate
+import queries
+import search
+import geo
+import scheduling
+import suggest
+
+BulkCommand = Manager(usage='Stream venues, artists and shows in and out of CSV/JSONL files')
+
+kinds = {
+    'venues': (Venue, VenueForm, ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                                  'website_link', 'genres', 'seeking_talent', 'seeking_description']),
+    'artists': (Artist, ArtistForm, ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                                     'website_link', 'genres', 'seeking_venue', 'seeking_description']),
+    'shows': (Show, ShowForm, ['artist_id', 'venue_id', 'start_time']),
+}
+
+
+#----------------------------------------------------------------------------#
+# Reading and validation.
+#----------------------------------------------------------------------------#
+
+def file_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    # yields (line number, dict) without loading the whole file
+    if fmt == 'jsonl':
+        for lineNo, line in enumerate(stream, 1):
+            if line.strip():
+                yield lineNo, json.loads(line)
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+#----------------------------------------------------------------------------#
+# Writing.
+#----------------------------------------------------------------------------#
+
+def array_literal(values):
+    return '{' + ','.join('"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"')) for value in values) + '}'
+
+
+def insert_batch(model, records):
+    if not records:
+        return
+    columns = list(records[0].keys())
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        # COPY is several times faster than INSERT for large batches
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow([array_literal(record[column]) if column == 'genres' and record[column] is not None
+                             else ('' if record[column] is None else record[column]) for column in columns])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY {0} ({1}) FROM STDIN WITH CSV'.format(model.__tablename__, ', '.join(columns)),
+                           buffer)
+    else:
+        connection.execute(model.__table__.insert(), records)
+
+
+def reject_existing(kind, batch):
+    # drops rows whose name already exists (case-insensitively), with one query for
+    # the whole batch
+    model = kinds[kind][0]
+    names = {record['name'].lower() for _, record in batch}
+    existing = {row[0] for row in db.session.query(func.lower(model.name)).filter(func.lower(model.name).in_(names))}
+    for lineNo, record in batch:
+        if record['name'].lower() in existing:
+            yield lineNo, record, 'Name "{0}" already exists.'.format(record['name'])
+        else:
+            existing.add(record['name'].lower())
+            yield lineNo, record, None
+
+
+def flush_batch(kind, batch, stats, errors):
+    if kind == 'shows':
+        # booked like "bulk schedule --partial": missing venues or artists and
+        # double bookings (against the database and the rows before) are rejected
+        records, rejected = scheduling.schedule_records(batch, partial=True)
+        for lineNo, error in rejected:
+            stats['rejected'] += 1
+            errors.write('line {0}: {1}\n'.format(lineNo, error))
+        db.session.commit()
+        stats['inserted'] += len(records)
+        return
+    model = kinds[kind][0]
+    records = []
+    for lineNo, record, error in reject_existing(kind, batch):
+        if error:
+            stats['rejected'] += 1
+            errors.write('line {0}: {1}\n'.format(lineNo, error))
+        else:
+            records.append(record)
+    insert_batch(model, records)
+    db.session.commit()
+    stats['inserted'] += len(records)
+
+
+def load_rows(kind, rows, batch_size=1000, errors=sys.stderr, progress=None):
+    model, formClass, columns = kinds[kind]
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0}
+    batch = []
+    for lineNo, row in rows:
+        stats['read'] += 1
+        form, error = validate(formClass, row)
+        if error:
+            stats['rejected'] += 1
+            errors.write('line {0}: {1}\n'.format(lineNo, error))
+            continue
+        record = {column: form[column].data for column in columns if column in form._fields}
+        if kind == 'shows':
+            record['artist_id'] = int(record['artist_id'])
+            record['venue_id'] = int(record['venue_id'])
+        else:
+            record['seeking_description'] = row.get('seeking_description') or None
+        if kind == 'venues':
+            record.update(geo.coordinates(record['city'], record['state']))
+        batch.append((lineNo, record))
+        if len(batch) >= batch_size:
+            flush_batch(kind, batch, stats, errors)
+            batch = []
+            if progress:
+                progress(stats)
+    flush_batch(kind, batch, stats, errors)
+    if progress:
+        progress(stats)
+    search.invalidate(model)
+    geo.invalidate()
+    suggest.invalidate()
+    responseCache.invalidate('all')
+    return stats
+
+
+def export_rows(kind, stream, fmt, batch_size=1000):
+    # streams a table out through a server-side cursor
+    model, _, columns = kinds[kind]
+    columns = ['id'] + columns
+    # shows moved to shows_archive are exported with the rest
+    table = queries.allShows.c if kind == 'shows' else model
+    query = db.session.query(*[getattr(table, column) for column in columns]) \
+        .order_by(table.id).execution_options(stream_results=True).yield_per(batch_size)
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    count = 0
+    for row in query:
+        record = dict(zip(columns, row))
+        if isinstance(record.get('start_time'), datetime):
+            record['start_time'] = record['start_time'].strftime('%Y-%m-%d %H:%M:%S')
+        if writer:
+            if record.get('genres') is not None:
+                record['genres'] = ','.join(record['genres'])
+            writer.writerow([record[column] for column in columns])
+        else:
+            stream.write(json.dumps(record) + '\n')
+        count += 1
+    return count
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def _print_progress(stats):
+    print('{read} read, {inserted} inserted, {rejected} rejected'.format(**stats), file=sys.stderr)
+
+
+@BulkCommand.option('path', help='CSV or JSONL file, - for stdin')
+@BulkCommand.option('kind', choices=sorted(kinds))
+@BulkCommand.option('--format', dest='fmt', choices=['csv', 'jsonl'], default=None)
+@BulkCommand.option('--batch', dest='batch', type=int, default=1000)
+def load(kind, path, fmt, batch):
+    """Import rows, validated with the same rules as the forms"""
+    fmt = file_format(path, fmt)
+    stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        stats = load_rows(kind, read_rows(stream, fmt), batch, progress=_print_progress)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if stats['rejected']:
+        sys.exit(1)
+
+
+@BulkCommand.option('path', help='CSV or JSONL file of artist_id, venue_id, start_time; - for stdin')
+@BulkCommand.option('--format', dest='fmt', choices=['csv', 'jsonl'], default=None)
+@BulkCommand.option('--partial', dest='partial', action='store_true', default=False,
+                    help='insert the valid shows even when others are rejected')
+def schedule(path, fmt, partial):
+    """Schedule a batch of shows in one transaction, rejecting double bookings"""
+    fmt = file_format(path, fmt)
+    stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        created, errors = scheduling.schedule_shows(read_rows(stream, fmt), partial)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    for lineNo, error in errors:
+        print('line {0}: {1}'.format(lineNo, error), file=sys.stderr)
+    if created:
+        db.session.commit()
+        scheduling.shows_changed(created)
+    else:
+        db.session.rollback()
+    print('{0} shows scheduled, {1} rejected'.format(len(created), len(errors)), file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+@BulkCommand.option('path', help='CSV or JSONL file, - for stdout')
+@BulkCommand.option('kind', choices=sorted(kinds))
+@BulkCommand.option('--format', dest='fmt', choices=['csv', 'jsonl'], default=None)
+@BulkCommand.option('--batch', dest='batch', type=int, default=1000)
+def dump(kind, path, fmt, batch):
+    """Export a table without loading it into memory"""
+    fmt = file_format(path, fmt)
+    stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+    try:
+        count = export_rows(kind, stream, fmt, batch)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print('{0} {1} exported'.format(count, kind), file=sys.stderr)
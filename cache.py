@@ -0,0 +1,235 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import request, session, make_response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import db, CacheTag
+from routing import replicas
+
+# Response cache for the read-heavy GET pages.
+#
+# Entries are tagged ('venues', 'venue:12', ...) through generational keys: every
+# tag has a version number that is part of the cache key, and invalidating a tag
+# bumps its version so older entries are never read again and age out of the LRU.
+# That keeps invalidation a single counter update on any backend.
+#
+# The time of each invalidation is kept where every worker sees it, in Redis or
+# else in the cache_tags table, so all workers send the same Last-Modified.
+#
+# With read replicas, a browser pinned to the primary after a write bypasses the
+# cache, and a page read from a replica within REPLICA_STICKY_SECONDS of a write to
+# one of its tags is served but not stored: it may predate the write, and would
+# otherwise be cached under the new tag version.
+
+
+class LocalBackend(object):
+    # in-process LRU with a TTL, bounded by entry count and total bytes
+
+    def __init__(self, max_entries=1000, max_bytes=32 * 1024 * 1024):
+        self.maxEntries = max_entries
+        self.maxBytes = max_bytes
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+        # tag versions live outside the LRU so they are never evicted
+        self.tagVersions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value, size = entry
+            if expires < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, size=1):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.time() + ttl, value, size)
+            self.totalBytes += size
+            while self.entries and (len(self.entries) > self.maxEntries or self.totalBytes > self.maxBytes):
+                self._remove(next(iter(self.entries)))
+
+    def versions(self, tags):
+        return [self.tagVersions.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        with self.lock:
+            self.tagVersions[tag] = self.tagVersions.get(tag, 0) + 1
+
+    def _remove(self, key):
+        self.totalBytes -= self.entries.pop(key)[2]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisBackend(object):
+    # shared backend so every gunicorn worker sees the same entries and tag versions
+
+    def __init__(self, url, prefix='fyyur:cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl, size=1):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def versions(self, tags):
+        return [int(version or 0) for version in self.client.mget([self.prefix + 'tag:' + tag for tag in tags])]
+
+    def bump(self, tag):
+        self.client.incr(self.prefix + 'tag:' + tag)
+
+    def touch(self, tags):
+        now = time.time()
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.hset(self.prefix + 'tag-times', tag, now)
+        pipeline.execute()
+
+    def modified(self, tags):
+        pipeline = self.client.pipeline()
+        # the first lookup records when tracking started as the time of 'all'
+        pipeline.hsetnx(self.prefix + 'tag-times', 'all', time.time())
+        pipeline.hmget(self.prefix + 'tag-times', tags)
+        return [float(value) if value is not None else None for value in pipeline.execute()[1]]
+
+    def __len__(self):
+        return 0
+
+
+class DatabaseTagTimes(object):
+    # tag invalidation times in the cache_tags table, read from and written to the
+    # primary so a lagging replica cannot hide a recent write
+
+    def touch(self, tags):
+        # one UPDATE, plus inserts for tags touched for the first time
+        now = time.time()
+        tags = set(tags)
+        table = CacheTag.__table__
+        with db.engine.begin() as connection:
+            if connection.execute(table.update().where(table.c.tag.in_(tags)).values(modified_at=now)).rowcount \
+                    == len(tags):
+                return
+            known = {row[0] for row in connection.execute(select([table.c.tag]).where(table.c.tag.in_(tags)))}
+            for tag in tags - known:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(table.insert().values(tag=tag, modified_at=now))
+                except IntegrityError:
+                    # inserted by another worker in the meantime, just as recently
+                    pass
+
+    def modified(self, tags):
+        table = CacheTag.__table__
+        times = dict(db.engine.execute(select([table.c.tag, table.c.modified_at])
+                                       .where(table.c.tag.in_(tags))).fetchall())
+        return [times.get(tag) for tag in tags]
+
+
+class ResponseCache(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.tagTimes = None
+        self.enabled = False
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+        self.ttl = app.config.get('CACHE_TTL', 60)
+        if app.config.get('CACHE_REDIS_URL'):
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = LocalBackend(app.config.get('CACHE_MAX_ENTRIES', 1000),
+                                        app.config.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self.tagTimes = self.backend if isinstance(self.backend, RedisBackend) else DatabaseTagTimes()
+        app.extensions['response_cache'] = self
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.bump(tag)
+        self.tagTimes.touch(tags)
+
+    def last_modified(self, tags):
+        # latest invalidation of any of the tags, or of 'all' (set by the migration
+        # that created cache_tags, or on first use in Redis); None when unknown
+        times = [stamp for stamp in self.tagTimes.modified(['all'] + list(tags)) if stamp is not None]
+        return datetime.utcfromtimestamp(max(times)) if times else None
+
+    def storable(self, tags):
+        # False for a page a lagging replica may have rendered from before a write
+        if not replicas.served_from_replica():
+            return True
+        times = [stamp for stamp in self.tagTimes.modified(tags) if stamp is not None]
+        return not times or max(times) < time.time() - replicas.stickySeconds
+
+    def key_for(self, tags):
+        versions = self.backend.versions(tags)
+        raw = '|'.join([request.full_path] + ['{0}={1}'.format(tag, version)
+                                              for tag, version in zip(tags, versions)])
+        return 'page:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "bytes": getattr(self.backend, 'totalBytes', None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def cached(self, tags=None):
+        # caches successful GET responses of a view; tags(**view_args) names the
+        # entities the page shows so writes to them can invalidate it
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pages rendered with pending flash messages must not be cached, and a
+                # browser reading its own writes must not get a page cached before them
+                if not self.enabled or request.method != 'GET' or session.get('_flashes') or replicas.pinned():
+                    return view(**kwargs)
+                pageTags = ['all'] + (tags(**kwargs) if tags else [])
+                key = self.key_for(pageTags)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    body, status, headers = entry
+                    return make_response(body, status, headers)
+                self.misses += 1
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and not response.is_streamed and self.storable(pageTags):
+                    body = response.get_data()
+                    headers = [(name, value) for name, value in response.headers
+                               if name.lower() not in ('set-cookie', 'content-length')]
+                    self.backend.set(key, (body, response.status_code, headers), self.ttl, len(body))
+                return response
+            return wrapper
+        return decorator
+
+
+responseCache = ResponseCache()
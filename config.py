@@ -10,3 +10,87 @@ DEBUG = True
 # SQLALCHEMY_DATABASE_URI = 'postgresql://ko-akande@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = True
 
+# Connection pool, sized per worker process: a sync worker needs one connection,
+# a gevent worker up to DB_POOL_SIZE + DB_MAX_OVERFLOW (see gunicorn_config.py)
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+}
+
+# Read replicas for GET requests, comma separated; a browser that just submitted a
+# form reads from the primary for REPLICA_STICKY_SECONDS (which should cover the
+# replication lag), a replica's health is checked at most every
+# REPLICA_CHECK_SECONDS, and an unreachable replica is skipped for
+# REPLICA_RETRY_SECONDS
+SQLALCHEMY_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+REPLICA_CHECK_SECONDS = int(os.environ.get('REPLICA_CHECK_SECONDS', 5))
+REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+# Per-request SQL profiling (Server-Timing header, /debug/sql in debug mode).
+# Requests running more than SQL_QUERY_BUDGET statements, or one statement shape
+# more than SQL_REPEAT_LIMIT times, are logged ('warn') or fail ('raise'); 0 disables
+SQL_PROFILER = os.environ.get('SQL_PROFILER', 'true').lower() == 'true'
+SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET', 20))
+SQL_REPEAT_LIMIT = int(os.environ.get('SQL_REPEAT_LIMIT', 5))
+SQL_BUDGET_MODE = os.environ.get('SQL_BUDGET_MODE', 'warn')
+
+# Page sizes for the keyset paginated list pages (?limit=)
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
+# ?limit=all streams the whole list, reading STREAM_BATCH_SIZE rows at a time
+STREAM_PAGES = os.environ.get('STREAM_PAGES', 'true').lower() == 'true'
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 1000))
+
+# Venue/artist search backend: 'database' (pg_trgm), 'memory' (in-process
+# trigram index) or 'auto' to pick 'database' on PostgreSQL
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+# With the 'memory' backend each worker rebuilds its index every SEARCH_MAX_AGE
+# seconds, to see venues and artists saved through other workers or the CLI
+SEARCH_MAX_AGE = int(os.environ.get('SEARCH_MAX_AGE', 300))
+
+# Response cache for the GET pages; set CACHE_REDIS_URL to share it between workers
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 60))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1000))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+# Calendar feeds: a show is listed as lasting SHOW_DURATION_MINUTES, a query may
+# span at most CALENDAR_MAX_DAYS and an iCalendar feed holds CALENDAR_MAX_EVENTS
+SHOW_DURATION_MINUTES = int(os.environ.get('SHOW_DURATION_MINUTES', 120))
+CALENDAR_MAX_DAYS = int(os.environ.get('CALENDAR_MAX_DAYS', 92))
+CALENDAR_MAX_EVENTS = int(os.environ.get('CALENDAR_MAX_EVENTS', 5000))
+
+# Most shows one POST /api/v1/shows/batch may schedule
+SCHEDULE_MAX_SHOWS = int(os.environ.get('SCHEDULE_MAX_SHOWS', 1000))
+
+# "manage.py partitions archive" moves shows older than this into shows_archive
+SHOWS_ARCHIVE_AFTER_DAYS = int(os.environ.get('SHOWS_ARCHIVE_AFTER_DAYS', 365))
+
+# Most venues /api/v1/venues/near returns in one response
+GEO_MAX_RESULTS = int(os.environ.get('GEO_MAX_RESULTS', 100))
+# Each worker rebuilds its venue locations every GEO_MAX_AGE seconds, to see
+# venues added or moved through other workers or the CLI
+GEO_MAX_AGE = int(os.environ.get('GEO_MAX_AGE', 300))
+
+# /api/v1/suggest returns at most SUGGEST_MAX_RESULTS suggestions; each worker
+# rebuilds its index every SUGGEST_MAX_AGE seconds to see other workers' writes
+SUGGEST_MAX_RESULTS = int(os.environ.get('SUGGEST_MAX_RESULTS', 20))
+SUGGEST_MAX_AGE = int(os.environ.get('SUGGEST_MAX_AGE', 300))
+
+# Compiled Jinja templates, shared by the workers and kept across restarts; fill it
+# with "manage.py templates compile", or set it empty to compile in memory only
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+
+# Fingerprinted bundles from "manage.py assets build" (set ASSETS_BUNDLED=false to
+# serve the source files); they are cached by browsers for ASSETS_MAX_AGE seconds
+ASSETS_BUNDLED = os.environ.get('ASSETS_BUNDLED', 'true').lower() == 'true'
+ASSETS_MAX_AGE = int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 3600))
+
+# JSON API responses larger than this are gzip (or brotli, when installed) compressed
+API_COMPRESS_MIN_SIZE = int(os.environ.get('API_COMPRESS_MIN_SIZE', 500))
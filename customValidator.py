@@ -1,5 +1,6 @@
 from wtforms.validators import ValidationError
-from flask import flash
+from flask import flash, request, current_app
+from werkzeug.datastructures import MultiDict
 import re
 
 
@@ -30,4 +31,40 @@ def flash_errors(form):
             flash(u"Error in the %s field - %s" % (
                 getattr(form, field).label.text,
                 error
-            ), 'error')
\ No newline at end of file
+            ), 'error')
+
+def page_args():
+    """Keyset pagination parameters of the list pages, with ?limit= clamped"""
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    return {
+        "after": request.args.get('after'),
+        "before": request.args.get('before'),
+        "limit": max(1, min(limit, current_app.config['MAX_PAGE_SIZE'])),
+    }
+
+booleanFields = ('seeking_talent', 'seeking_venue')
+
+def to_formdata(row):
+    """Form data for a dict of field values, as the browser would post it"""
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            genres = value if isinstance(value, list) else value.strip('{}').split(',')
+            for genre in genres:
+                if genre.strip():
+                    formdata.add('genres', genre.strip().strip('"'))
+        elif key in booleanFields:
+            if str(value).lower() in ('y', 'yes', 'true', '1'):
+                formdata.add(key, 'y')
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+def validate(formClass, row):
+    """Runs a form's validators on a dict, without CSRF; returns (form, error)"""
+    form = formClass(formdata=to_formdata(row), meta={'csrf': False})
+    if form.validate():
+        return form, None
+    return form, '; '.join('{0}: {1}'.format(field, ', '.join(errors)) for field, errors in form.errors.items())
@@ -0,0 +1,30 @@
+from functools import lru_cache
+import dateutil.parser
+from babel import Locale
+from babel.dates import LC_TIME, parse_pattern
+
+# The `datetime` Jinja filter. Babel patterns are parsed once per (format, locale)
+# and formatted strings are memoized, since list pages repeat the same start times.
+
+namedFormats = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    return parse_pattern(namedFormats.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale):
+    pattern, babelLocale = compiled_pattern(format, locale)
+    return pattern.apply(value, babelLocale)
+
+
+def format_datetime(value, format='medium', locale=LC_TIME):
+    # accepts datetimes, and date strings for callers that still pass them
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return _format(value, format, locale)
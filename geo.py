@@ -0,0 +1,154 @@
+import csv
+import heapq
+import math
+import os
+from models import db, Venue
+from background import BackgroundIndex, cooperative
+
+# Venue proximity search.
+#
+# Venues are geocoded offline from data/us_centroids.csv: the centroid of their city,
+# or of their state when the city is not listed. Nearest-neighbour queries run on an
+# in-process KD-tree over points on the unit sphere, a background.BackgroundIndex
+# invalidated by the write views and rebuilt every GEO_MAX_AGE seconds.
+
+earthRadiusKm = 6371.0
+centroidsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'us_centroids.csv')
+centroids = {}
+
+
+def load_centroids():
+    if not centroids:
+        with open(centroidsPath, newline='', encoding='utf-8') as stream:
+            for row in csv.DictReader(stream):
+                centroids[(row['city'].strip().lower(), row['state'])] = \
+                    (float(row['latitude']), float(row['longitude']))
+    return centroids
+
+
+def geocode(city, state):
+    # (latitude, longitude) of the city, else of the state, else None
+    table = load_centroids()
+    state = (state or '').strip().upper()
+    return table.get(((city or '').strip().lower(), state)) or table.get(('', state))
+
+
+def coordinates(city, state):
+    # geocode() as the venue columns, None when unknown
+    point = geocode(city, state)
+    return {'latitude': point[0] if point else None, 'longitude': point[1] if point else None}
+
+
+def to_vector(latitude, longitude):
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def squared_distance(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+def chord_to_km(distanceSquared):
+    return 2 * earthRadiusKm * math.asin(min(1.0, math.sqrt(distanceSquared) / 2))
+
+
+class KDTree(object):
+    # 3-d tree over unit vectors; the straight-line (chord) distance between two
+    # of them orders points the same way as the great-circle distance
+
+    def __init__(self, points):
+        # points are (id, (x, y, z)) pairs
+        points = list(points)
+        self.size = len(points)
+        self.root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda point: point[1][axis])
+        middle = len(points) // 2
+        return (points[middle], axis,
+                self._build(points[:middle], depth + 1), self._build(points[middle + 1:], depth + 1))
+
+    def nearest(self, vector):
+        # yields (squared chord distance, id), closest first, for as long as the
+        # caller keeps reading. Subtrees wait in the heap under a lower bound of
+        # their distance, so a point is only yielded once nothing can beat it
+        heap = [(0.0, 0, self.root, None)] if self.root else []
+        counter = 1
+        while heap:
+            key, _, node, pointId = heapq.heappop(heap)
+            if node is None:
+                yield key, pointId
+                continue
+            (pointId, point), axis, left, right = node
+            heapq.heappush(heap, (squared_distance(point, vector), counter, None, pointId))
+            diff = vector[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            if near is not None:
+                heapq.heappush(heap, (key, counter + 1, near, None))
+            if far is not None:
+                heapq.heappush(heap, (max(key, diff * diff), counter + 2, far, None))
+            counter += 3
+
+
+def build():
+    rows = db.session.query(Venue.id, Venue.latitude, Venue.longitude) \
+        .filter(Venue.latitude.isnot(None), Venue.longitude.isnot(None))
+    return KDTree((row.id, to_vector(row.latitude, row.longitude)) for row in cooperative(rows))
+
+
+index = BackgroundIndex('venue proximity index', build, 'GEO_MAX_AGE')
+
+
+def invalidate():
+    index.invalidate()
+
+
+def get_index():
+    return index.get()
+
+
+def _with_upcoming(candidates):
+    # the candidates that have upcoming shows, in distance order
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.address, Venue.city, Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(Venue.id.in_([venueId for _, venueId in candidates]), Venue.upcoming_shows_count > 0)
+    byId = {row.id: row for row in rows}
+    return [(byId[venueId], chord_to_km(distance)) for distance, venueId in candidates if venueId in byId]
+
+
+def nearest_venues(latitude, longitude, limit=10):
+    # the `limit` closest venues with upcoming shows as (row, km) pairs. Neighbours
+    # are checked against the database in growing batches, so venues without
+    # upcoming shows cost one IN query per batch rather than one per venue
+    results = []
+    batch = []
+    batchSize = max(limit * 2, 16)
+    for candidate in get_index().nearest(to_vector(latitude, longitude)):
+        batch.append(candidate)
+        if len(batch) >= batchSize:
+            results += _with_upcoming(batch)
+            if len(results) >= limit:
+                return results[:limit]
+            batch = []
+            batchSize *= 2
+    results += _with_upcoming(batch)
+    return results[:limit]
+
+
+def geocode_venues():
+    # fills in the coordinates of venues that have none, one UPDATE per (city, state);
+    # returns how many venues were updated. Caller commits
+    updated = 0
+    areas = db.session.query(Venue.city, Venue.state).filter(Venue.latitude.is_(None)).distinct().all()
+    for city, state in areas:
+        point = geocode(city, state)
+        if point is None:
+            continue
+        updated += Venue.query.filter(Venue.city == city, Venue.state == state, Venue.latitude.is_(None)) \
+            .update({'latitude': point[0], 'longitude': point[1]}, synchronize_session=False)
+    invalidate()
+    return updated
@@ -0,0 +1,80 @@
+import os
+import glob
+import multiprocessing
+import tempfile
+import time
+
+# Serving modes, picked with WORKER_CLASS:
+#
+#   sync    one request per worker process at a time (the default)
+#   gevent  WORKER_CONNECTIONS concurrent requests per worker on greenlets, so a
+#           slow query only parks its own greenlet; needs gevent and psycogreen
+#
+# Keep WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the database's
+# max_connections.
+
+bind = '0.0.0.0:{0}'.format(os.environ.get('PORT', '8000'))
+worker_class = os.environ.get('WORKER_CLASS', 'sync')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+accesslog = os.environ.get('ACCESS_LOG')
+
+# sync workers fork from a master that has already imported the app and loaded
+# every template and built the suggestion index (when_ready), so they start with
+# both in memory. gevent workers import the app themselves, after monkey-patching,
+# and warm up on their own
+preload_app = os.environ.get('PRELOAD_APP', str(worker_class == 'sync')).lower() == 'true'
+
+# workers share /metrics samples through files in this directory. It has to exist
+# before the app (and prometheus_client) is imported, which with preload_app is
+# before on_starting runs, so it is prepared here as the config is read. Samples
+# left over from a previous run would be merged into the new one
+os.environ.setdefault('prometheus_multiproc_dir', os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+os.makedirs(os.environ['prometheus_multiproc_dir'], exist_ok=True)
+for path in glob.glob(os.path.join(os.environ['prometheus_multiproc_dir'], '*.db')):
+    os.remove(path)
+
+
+def warm_up(log):
+    from app import app
+    from jinjacache import templateCache
+    timings = templateCache.warm_up(app)
+    log.info('loaded %d templates in %.3fs', len(timings), sum(seconds for _, seconds in timings))
+    import suggest
+    from models import db
+    start = time.perf_counter()
+    with app.app_context():
+        try:
+            log.info('built the suggestion index (%d keys) in %.3fs',
+                     len(suggest.get_index()), time.perf_counter() - start)
+        except Exception as error:
+            # built on the first lookup instead
+            log.warning('suggestion index not built: %s', error)
+        finally:
+            # forked workers must not share the master's connections
+            db.session.remove()
+            db.engine.dispose()
+
+
+def when_ready(server):
+    if preload_app:
+        warm_up(server.log)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # make psycopg2 yield to other greenlets while it waits on the database
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        warm_up(worker.log)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,96 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+from flask import current_app
+from flask_script import Manager
+from jinja2 import FileSystemBytecodeCache
+
+# Compiled template cache.
+#
+# Jinja compiles a template to Python the first time it is loaded, which used to
+# happen on the first request for each page in every new worker. The compiled code
+# is now kept in TEMPLATE_CACHE_DIR, shared by all workers and surviving restarts,
+# and only recompiled when the template's source changes. "templates compile"
+# fills the cache ahead of time (e.g. while building a release), and
+# gunicorn_config.py warms each worker's in-memory template cache before it
+# serves, from the master before forking when the app is preloaded.
+
+log = logging.getLogger(__name__)
+
+TemplateCommand = Manager(usage='Precompile the Jinja templates')
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    # several workers write to the same directory, so each file is written under
+    # a temporary name and renamed into place; a reader never sees half of one
+
+    def dump_bytecode(self, bucket):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(handle, 'wb') as stream:
+                bucket.write_bytecode(stream)
+            os.replace(temporary, self._get_cache_filename(bucket))
+        except OSError:
+            # an unwritable cache only costs a recompile next time
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+class TemplateCache(object):
+
+    def __init__(self, app=None):
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get('TEMPLATE_CACHE_DIR')
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except OSError as error:
+                log.warning('template cache disabled: %s', error)
+                self.directory = None
+        if self.directory:
+            app.jinja_env.bytecode_cache = SharedBytecodeCache(self.directory, 'fyyur-%s.cache')
+        app.extensions['template_cache'] = self
+
+    def template_names(self, app):
+        return app.jinja_env.list_templates(extensions=['html'])
+
+    def warm_up(self, app):
+        # loads every template into the environment's in-memory cache, compiling
+        # (and storing the bytecode of) the ones not in the bytecode cache yet;
+        # returns (name, seconds) pairs
+        timings = []
+        for name in self.template_names(app):
+            start = time.perf_counter()
+            app.jinja_env.get_template(name)
+            timings.append((name, time.perf_counter() - start))
+        return timings
+
+
+templateCache = TemplateCache()
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@TemplateCommand.option('--force', dest='force', action='store_true', default=False,
+                        help='recompile every template instead of only the changed ones')
+def compile(force):
+    """Compile every template into TEMPLATE_CACHE_DIR"""
+    app = current_app._get_current_object()
+    bytecodeCache = app.jinja_env.bytecode_cache
+    if bytecodeCache is None:
+        sys.exit('TEMPLATE_CACHE_DIR is not set')
+    if force:
+        bytecodeCache.clear()
+    app.jinja_env.cache.clear()
+    timings = templateCache.warm_up(app)
+    for name, seconds in timings:
+        print('{0:<32} {1:.1f}ms'.format(name, seconds * 1000))
+    print('{0} templates in {1}'.format(len(timings), templateCache.directory), file=sys.stderr)
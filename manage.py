@@ -1,14 +1,46 @@
-from flask_script import Manager
+from flask_script import Manager, Command
 from flask_migrate import Migrate, MigrateCommand
 
 from app import app
 from models import db
+from bench import BenchCommand
+from bulk import BulkCommand
+from partitions import PartitionCommand
+from assets import AssetCommand
+from jinjacache import TemplateCommand
+from queries import refresh_upcoming_counts
+from geo import geocode_venues
+
+
+class RefreshCounts(Command):
+    """Recount upcoming shows per venue and artist (run on a schedule)"""
+
+    def run(self):
+        refresh_upcoming_counts()
+        db.session.commit()
+
+
+class GeocodeVenues(Command):
+    """Fill in missing venue coordinates from the bundled city/state centroids"""
+
+    def run(self):
+        updated = geocode_venues()
+        db.session.commit()
+        print('{0} venues geocoded'.format(updated))
+
 
 migrate = Migrate(app, db)
 manager = Manager(app)
 
 manager.add_command('db', MigrateCommand)
+manager.add_command('bench', BenchCommand)
+manager.add_command('bulk', BulkCommand)
+manager.add_command('partitions', PartitionCommand)
+manager.add_command('assets', AssetCommand)
+manager.add_command('templates', TemplateCommand)
+manager.add_command('refresh_counts', RefreshCounts())
+manager.add_command('geocode', GeocodeVenues())
 
 
 if __name__ == '__main__':
-    manager.run()
\ No newline at end of file
+    manager.run()
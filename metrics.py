@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from flask import Response, g, request, before_render_template, template_rendered
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST,
+                               REGISTRY, generate_latest, multiprocess)
+from poolstats import poolStats
+
+# Prometheus metrics served at /metrics.
+#
+# Under gunicorn every worker writes its samples to memory-mapped files in
+# $prometheus_multiproc_dir (set up by gunicorn_config.py) and the scrape merges
+# them, so any worker can answer for the whole server. Without that variable the
+# metrics are per process, which is what the development server needs.
+#
+# The pool metrics are copied from poolStats, which owns the pool event listeners,
+# after every request and before every scrape.
+
+latencyBuckets = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter('fyyur_http_requests_total', 'HTTP requests', ['endpoint', 'method', 'status'])
+LATENCY = Histogram('fyyur_http_request_duration_seconds', 'HTTP request latency', ['endpoint', 'method'],
+                    buckets=latencyBuckets)
+DB_TIME = Histogram('fyyur_http_request_db_seconds', 'Database time per request', ['endpoint'],
+                    buckets=latencyBuckets)
+IN_FLIGHT = Gauge('fyyur_http_requests_in_flight', 'Requests being served', multiprocess_mode='livesum')
+TEMPLATE_RENDER = Histogram('fyyur_template_render_seconds', 'Template render time', ['template'],
+                            buckets=latencyBuckets)
+POOL_CHECKOUTS = Counter('fyyur_db_pool_checkouts_total', 'Connections checked out of the pool')
+POOL_CONNECTS = Counter('fyyur_db_pool_connects_total', 'New database connections opened')
+POOL_IN_USE = Gauge('fyyur_db_pool_connections_in_use', 'Connections checked out right now',
+                    multiprocess_mode='livesum')
+
+
+def endpoint_label():
+    # the view name rather than the path, so ids do not explode the label set
+    return request.endpoint or 'unmatched'
+
+
+class Metrics(object):
+
+    def __init__(self, app=None):
+        # poolStats counts already added to the pool counters
+        self.poolCheckouts = 0
+        self.poolConnects = 0
+        self.poolLock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.teardown_request(self._finish)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+        poolStats.install()
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_in_flight = True
+        IN_FLIGHT.inc()
+
+    def _record(self, response):
+        start = g.get('metrics_start')
+        if start is not None:
+            endpoint = endpoint_label()
+            LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+            REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+            profile = g.get('sql_profile')
+            if profile is not None:
+                DB_TIME.labels(endpoint).observe(profile['seconds'])
+        self._sync_pool()
+        return response
+
+    def _finish(self, exception):
+        if g.pop('metrics_in_flight', False):
+            IN_FLIGHT.dec()
+
+    def _before_render(self, sender, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def _rendered(self, sender, template, context, **extra):
+        renders = g.get('metrics_renders')
+        if renders:
+            TEMPLATE_RENDER.labels(template.name or 'string').observe(time.perf_counter() - renders.pop())
+
+    def _sync_pool(self):
+        with poolStats.lock:
+            checkouts, connects, checkedOut = poolStats.checkouts, poolStats.connects, poolStats.checkedOut
+        with self.poolLock:
+            POOL_CHECKOUTS.inc(checkouts - self.poolCheckouts)
+            POOL_CONNECTS.inc(connects - self.poolConnects)
+            self.poolCheckouts, self.poolConnects = checkouts, connects
+            POOL_IN_USE.set(checkedOut)
+
+    def export(self):
+        self._sync_pool()
+        if 'prometheus_multiproc_dir' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
@@ -0,0 +1,36 @@
+"""store genres as indexed arrays
+
+Revision ID: 2b7d9e4c1a53
+Revises: 8f3b6d2e4a10
+Create Date: 2026-10-18 18:21:09.730562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7d9e4c1a53'
+down_revision = '8f3b6d2e4a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ['venues', 'artists']:
+        # the column held the text form of the arrays the app wrote ('{Jazz,"Rock n Roll"}'),
+        # which casts straight to varchar[]
+        op.execute("ALTER TABLE {0} ALTER COLUMN genres TYPE varchar(120)[] USING "
+                   "CASE WHEN genres IS NULL OR genres = '' THEN NULL ELSE genres::varchar(120)[] END"
+                   .format(table))
+        op.create_index('ix_{0}_genres'.format(table), table, ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ['venues', 'artists']:
+        op.drop_index('ix_{0}_genres'.format(table), table_name=table)
+        op.execute("ALTER TABLE {0} ALTER COLUMN genres TYPE varchar(120) USING genres::text".format(table))
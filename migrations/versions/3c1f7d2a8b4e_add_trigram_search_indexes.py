@@ -0,0 +1,37 @@
+"""add trigram search indexes on venue and artist name, city and state
+
+Revision ID: 3c1f7d2a8b4e
+Revises: 9e5da2fd10f8
+Create Date: 2026-10-18 09:12:40.517203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f7d2a8b4e'
+down_revision = '9e5da2fd10f8'
+branch_labels = None
+depends_on = None
+
+searchColumns = ['name', 'city', 'state']
+
+
+def upgrade():
+    # GIN trigram indexes let the ILIKE '%term%' searches use an index scan
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ['venues', 'artists']:
+        for column in searchColumns:
+            op.create_index('ix_{0}_{1}_trgm'.format(table, column), table, [column],
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ['venues', 'artists']:
+        for column in searchColumns:
+            op.drop_index('ix_{0}_{1}_trgm'.format(table, column), table_name=table)
@@ -0,0 +1,42 @@
+"""make venue and artist names unique case-insensitively
+
+Revision ID: 5e9c0a3f7d21
+Revises: d4a8e1b6c357
+Create Date: 2026-10-18 11:26:48.075392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9c0a3f7d21'
+down_revision = 'd4a8e1b6c357'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # names that differ only in case (left by the old check-then-insert race) would
+    # stop the unique index from being built. They are listed rather than renamed,
+    # so the owners can decide which record keeps the name
+    connection = op.get_bind()
+    conflicts = []
+    for table in ['venues', 'artists']:
+        rows = connection.execute(sa.text(
+            "SELECT id, name FROM {0} dup WHERE EXISTS "
+            "(SELECT 1 FROM {0} other WHERE lower(other.name) = lower(dup.name) AND other.id <> dup.id) "
+            "ORDER BY lower(name), id".format(table)))
+        conflicts += ['  {0} {1}: {2}'.format(table, row.id, row.name) for row in rows]
+    if conflicts:
+        raise RuntimeError('these names are not unique case-insensitively; rename or merge the records, '
+                           'then run the upgrade again:\n' + '\n'.join(conflicts))
+    for table in ['venues', 'artists']:
+        op.drop_index('ix_{0}_lower_name'.format(table), table_name=table)
+        op.create_index('ux_{0}_lower_name'.format(table), table, [sa.text('lower(name)')], unique=True)
+
+
+def downgrade():
+    for table in ['venues', 'artists']:
+        op.drop_index('ux_{0}_lower_name'.format(table), table_name=table)
+        op.create_index('ix_{0}_lower_name'.format(table), table, [sa.text('lower(name)')])
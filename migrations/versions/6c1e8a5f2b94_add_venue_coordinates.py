@@ -0,0 +1,27 @@
+"""add venue coordinates
+
+Revision ID: 6c1e8a5f2b94
+Revises: 2b7d9e4c1a53
+Create Date: 2026-10-18 18:40:52.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1e8a5f2b94'
+down_revision = '2b7d9e4c1a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in by "python manage.py geocode" and by the venue forms afterwards
+    op.add_column('venues', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venues', sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('venues', 'longitude')
+    op.drop_column('venues', 'latitude')
@@ -0,0 +1,31 @@
+"""add upcoming show counters to venues and artists
+
+Revision ID: 7b2e4c9d1f06
+Revises: 3c1f7d2a8b4e
+Create Date: 2026-10-18 10:03:15.284611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4c9d1f06'
+down_revision = '3c1f7d2a8b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    # backfill; "python manage.py refresh_counts" keeps them current afterwards
+    op.execute("UPDATE venues SET upcoming_shows_count = "
+               "(SELECT count(*) FROM shows WHERE shows.venue_id = venues.id AND shows.start_time > CURRENT_TIMESTAMP)")
+    op.execute("UPDATE artists SET upcoming_shows_count = "
+               "(SELECT count(*) FROM shows WHERE shows.artist_id = artists.id AND shows.start_time > CURRENT_TIMESTAMP)")
+
+
+def downgrade():
+    op.drop_column('artists', 'upcoming_shows_count')
+    op.drop_column('venues', 'upcoming_shows_count')
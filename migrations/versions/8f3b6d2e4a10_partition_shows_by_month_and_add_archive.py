@@ -0,0 +1,111 @@
+"""partition shows by month and add shows_archive
+
+Revision ID: 8f3b6d2e4a10
+Revises: 5e9c0a3f7d21
+Create Date: 2026-10-18 18:02:37.514208
+
+"""
+import os
+from datetime import datetime, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b6d2e4a10'
+down_revision = '5e9c0a3f7d21'
+branch_labels = None
+depends_on = None
+
+showIndexes = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', ['start_time', 'id']),
+]
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def partitioned():
+    # set SHOWS_PARTITIONED=false to keep shows a plain table on PostgreSQL
+    return op.get_bind().dialect.name == 'postgresql' and \
+        os.environ.get('SHOWS_PARTITIONED', 'true').lower() == 'true'
+
+
+def upgrade():
+    op.create_table('shows_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_shows_archive_venue_id_start_time', 'shows_archive', ['venue_id', 'start_time'])
+    op.create_index('ix_shows_archive_artist_id_start_time', 'shows_archive', ['artist_id', 'start_time'])
+    if not partitioned():
+        return
+    # the partition key has to be part of the primary key, so the table is rebuilt
+    # as PARTITION BY RANGE (start_time) with one partition per month of data and
+    # three months ahead; later months come from "manage.py partitions create"
+    op.execute('ALTER TABLE shows RENAME TO shows_unpartitioned')
+    op.execute('ALTER TABLE shows_unpartitioned RENAME CONSTRAINT shows_pkey TO shows_unpartitioned_pkey')
+    op.execute("""
+        CREATE TABLE shows (
+            id integer NOT NULL DEFAULT nextval('shows_id_seq'),
+            artist_id integer NOT NULL REFERENCES artists (id),
+            venue_id integer NOT NULL REFERENCES venues (id),
+            start_time timestamp without time zone NOT NULL,
+            CONSTRAINT shows_pkey PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)""")
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+    first, last = op.get_bind().execute('SELECT min(start_time), max(start_time) FROM shows_unpartitioned').first()
+    now = datetime.now()
+    month = month_start(min(first or now, now))
+    end = next_month(max(last or now, now + timedelta(days=92)))
+    while month < end:
+        op.execute("CREATE TABLE shows_p{0:%Y%m} PARTITION OF shows FOR VALUES FROM ('{0:%Y-%m-%d}') TO ('{1:%Y-%m-%d}')"
+                   .format(month, next_month(month)))
+        month = next_month(month)
+    op.execute('INSERT INTO shows (id, artist_id, venue_id, start_time) '
+               'SELECT id, artist_id, venue_id, start_time FROM shows_unpartitioned')
+    op.execute('DROP TABLE shows_unpartitioned')
+    for name, columns in showIndexes:
+        op.create_index(name, 'shows', columns)
+
+
+def downgrade():
+    # archived shows go back into shows before the archive is dropped
+    op.execute('INSERT INTO shows (id, artist_id, venue_id, start_time) '
+               'SELECT id, artist_id, venue_id, start_time FROM shows_archive')
+    op.drop_index('ix_shows_archive_artist_id_start_time', table_name='shows_archive')
+    op.drop_index('ix_shows_archive_venue_id_start_time', table_name='shows_archive')
+    op.drop_table('shows_archive')
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or \
+            bind.execute("SELECT relkind FROM pg_class WHERE oid = 'shows'::regclass").scalar() != 'p':
+        return
+    op.execute("""
+        CREATE TABLE shows_unpartitioned (
+            id integer NOT NULL DEFAULT nextval('shows_id_seq'),
+            artist_id integer NOT NULL REFERENCES artists (id),
+            venue_id integer NOT NULL REFERENCES venues (id),
+            start_time timestamp without time zone NOT NULL,
+            CONSTRAINT shows_unpartitioned_pkey PRIMARY KEY (id)
+        )""")
+    op.execute('INSERT INTO shows_unpartitioned (id, artist_id, venue_id, start_time) '
+               'SELECT id, artist_id, venue_id, start_time FROM shows')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows_unpartitioned.id')
+    op.execute('DROP TABLE shows')
+    op.execute('ALTER TABLE shows_unpartitioned RENAME TO shows')
+    op.execute('ALTER TABLE shows RENAME CONSTRAINT shows_unpartitioned_pkey TO shows_pkey')
+    for name, columns in showIndexes:
+        op.create_index(name, 'shows', columns)
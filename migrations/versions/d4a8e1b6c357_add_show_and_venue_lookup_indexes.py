@@ -0,0 +1,38 @@
+"""add lookup indexes on shows, venues and artists
+
+Revision ID: d4a8e1b6c357
+Revises: 7b2e4c9d1f06
+Create Date: 2026-10-18 10:41:02.930154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8e1b6c357'
+down_revision = '7b2e4c9d1f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # per venue / per artist show lookups split on start_time
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'])
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'])
+    # the /shows listing seeks on (start_time, id)
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+    # the /venues directory orders and seeks on (state, city, id)
+    op.create_index('ix_venues_state_city_id', 'venues', ['state', 'city', 'id'])
+    # case-insensitive duplicate name checks
+    op.create_index('ix_venues_lower_name', 'venues', [sa.text('lower(name)')])
+    op.create_index('ix_artists_lower_name', 'artists', [sa.text('lower(name)')])
+
+
+def downgrade():
+    op.drop_index('ix_artists_lower_name', table_name='artists')
+    op.drop_index('ix_venues_lower_name', table_name='venues')
+    op.drop_index('ix_venues_state_city_id', table_name='venues')
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
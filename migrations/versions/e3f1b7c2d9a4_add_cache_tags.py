@@ -0,0 +1,31 @@
+"""add cache tag times
+
+Revision ID: e3f1b7c2d9a4
+Revises: 6c1e8a5f2b94
+Create Date: 2026-10-18 21:12:37.460128
+
+"""
+import time
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f1b7c2d9a4'
+down_revision = '6c1e8a5f2b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cacheTags = op.create_table('cache_tags',
+    sa.Column('tag', sa.String(length=200), nullable=False),
+    sa.Column('modified_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('tag')
+    )
+    # earlier changes are not known; Last-Modified starts from the upgrade
+    op.bulk_insert(cacheTags, [{'tag': 'all', 'modified_at': time.time()}])
+
+
+def downgrade():
+    op.drop_table('cache_tags')
@@ -0,0 +1,25 @@
+"""index archived shows by start time
+
+Revision ID: f7a2c5e8b3d1
+Revises: e3f1b7c2d9a4
+Create Date: 2026-10-18 21:48:05.913277
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a2c5e8b3d1'
+down_revision = 'e3f1b7c2d9a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the calendar reads archived shows by date range, like ix_shows_start_time_id
+    op.create_index('ix_shows_archive_start_time_id', 'shows_archive', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_archive_start_time_id', table_name='shows_archive')
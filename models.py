@@ -2,17 +2,18 @@ import os
 import json
 from sqlalchemy import Column, Integer, String, Boolean
 from sqlalchemy.dialects.postgresql import ARRAY
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy, engine_options
 
-dbpath = os.environ['DATABASE_URL']
-
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 
 def setup_db(app):
+    # the engine is created on first use; the schema is managed by the migrations
+    # ("python manage.py db upgrade"), not at start-up
+    dbpath = app.config.get('SQLALCHEMY_DATABASE_URI') or os.environ['DATABASE_URL']
     app.config["SQLALCHEMY_DATABASE_URI"] = dbpath
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(dbpath, app.config.get('SQLALCHEMY_ENGINE_OPTIONS'))
     db.app = app
     db.init_app(app)
-    db.create_all()
 
 
 #----------------------------------------------------------------------------#
@@ -21,6 +22,11 @@ def setup_db(app):
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city_id', 'state', 'city', 'id'),
+        db.Index('ux_venues_lower_name', db.text('lower(name)'), unique=True),
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -34,6 +40,11 @@ class Venue(db.Model):
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500), nullable=True)
+    # city/state centroid from geo.geocode, for the proximity search
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # maintained by queries.refresh_upcoming_counts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref= db.backref('venue', lazy=True))
 
     # def __init__(self, name, city, state, address, phone, image_link, facebook_link, genres, website_link, seeking_talent):
@@ -69,6 +80,10 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ux_artists_lower_name', db.text('lower(name)'), unique=True),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -81,13 +96,46 @@ class Artist(db.Model):
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # maintained by queries.refresh_upcoming_counts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref = db.backref('artist', lazy=True))
 
 
 class Show(db.Model):
   __tablename__= 'shows'
+  __table_args__ = (
+      db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
   venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-  start_time = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+  start_time = db.Column(db.DateTime, nullable=False)
+
+
+class ShowArchive(db.Model):
+  # past shows moved out of `shows` by partitions.archive_shows; detail pages read
+  # both tables through queries.all_shows
+  __tablename__ = 'shows_archive'
+  __table_args__ = (
+      db.Index('ix_shows_archive_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_shows_archive_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_shows_archive_start_time_id', 'start_time', 'id'),
+  )
+
+  id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+  start_time = db.Column(db.DateTime, nullable=False)
+
+
+class CacheTag(db.Model):
+  # when each response cache tag was last invalidated, for Last-Modified headers
+  # that agree across workers when the cache itself is kept per process
+  __tablename__ = 'cache_tags'
+
+  tag = db.Column(db.String(200), primary_key=True)
+  # seconds since the epoch, as in the Redis cache backend
+  modified_at = db.Column(db.Float, nullable=False)
@@ -0,0 +1,163 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_script import Manager, Command
+from sqlalchemy import select
+from models import db, Show, ShowArchive
+
+# Monthly range partitions of `shows` and archival of past shows.
+#
+# On PostgreSQL migration 8f3b6d2e4a10 turns `shows` into a table partitioned by
+# month on start_time (shows_pYYYYMM, plus shows_default for anything outside the
+# created ranges). "partitions create" adds the coming months ahead of time and
+# "partitions archive" moves shows older than the cutoff into shows_archive,
+# detaching whole partitions where it can. On other databases, or with
+# SHOWS_PARTITIONED=false, `shows` is a plain table and archiving moves rows.
+
+PartitionCommand = Manager(usage='Maintain the monthly shows partitions and archive past shows')
+
+archiveColumns = ['id', 'artist_id', 'venue_id', 'start_time']
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def partition_name(month):
+    return 'shows_p{0:%Y%m}'.format(month)
+
+
+def is_partitioned():
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute("SELECT relkind FROM pg_class WHERE oid = 'shows'::regclass").scalar() == 'p'
+
+
+def partitions():
+    # (name, first day of the month) of every monthly partition, oldest first
+    rows = db.session.execute(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'shows'::regclass")
+    months = []
+    for (name,) in rows:
+        try:
+            months.append((name, datetime.strptime(name, 'shows_p%Y%m')))
+        except ValueError:
+            continue
+    return sorted(months, key=lambda partition: partition[1])
+
+
+def create_partition(month):
+    # rows that already landed in shows_default for this month move into the new
+    # partition, otherwise ATTACH would fail
+    name = partition_name(month)
+    bounds = "FROM ('{0:%Y-%m-%d}') TO ('{1:%Y-%m-%d}')".format(month, next_month(month))
+    inRange = "start_time >= '{0:%Y-%m-%d}' AND start_time < '{1:%Y-%m-%d}'".format(month, next_month(month))
+    db.session.execute('CREATE TABLE {0} (LIKE shows INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name))
+    db.session.execute('INSERT INTO {0} SELECT * FROM shows_default WHERE {1}'.format(name, inRange))
+    db.session.execute('DELETE FROM shows_default WHERE {0}'.format(inRange))
+    db.session.execute('ALTER TABLE shows ATTACH PARTITION {0} FOR VALUES {1}'.format(name, bounds))
+
+
+def create_partitions(months_ahead=3, now=None):
+    # makes sure every month from now to `months_ahead` out has a partition; returns
+    # the names created. Caller commits
+    existing = {name for name, _ in partitions()}
+    created = []
+    month = month_start(now or datetime.now())
+    for _ in range(months_ahead + 1):
+        if partition_name(month) not in existing:
+            create_partition(month)
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+
+def dump_shows(stream, before):
+    # writes the shows about to be archived as JSONL, through a server-side cursor
+    query = db.session.query(*[getattr(Show, column) for column in archiveColumns]) \
+        .filter(Show.start_time < before).order_by(Show.start_time, Show.id) \
+        .execution_options(stream_results=True).yield_per(1000)
+    count = 0
+    for row in query:
+        record = dict(zip(archiveColumns, row))
+        record['start_time'] = record['start_time'].strftime('%Y-%m-%d %H:%M:%S')
+        stream.write(json.dumps(record) + '\n')
+        count += 1
+    return count
+
+
+def archive_shows(before):
+    # moves shows that started before `before` into shows_archive and returns how
+    # many moved. Only past shows move, so the upcoming counters are unaffected.
+    # Caller commits
+    moved = 0
+    if is_partitioned():
+        for name, month in partitions():
+            if next_month(month) > before:
+                break
+            db.session.execute('ALTER TABLE shows DETACH PARTITION {0}'.format(name))
+            moved += db.session.execute('INSERT INTO shows_archive ({0}) SELECT {0} FROM {1}'.format(
+                ', '.join(archiveColumns), name)).rowcount
+            db.session.execute('DROP TABLE {0}'.format(name))
+    # rows of a partly covered month, of shows_default, or of an unpartitioned table
+    columns = [getattr(Show, column) for column in archiveColumns]
+    moved += db.session.execute(ShowArchive.__table__.insert().from_select(
+        archiveColumns, select(columns).where(Show.start_time < before))).rowcount
+    Show.query.filter(Show.start_time < before).delete(synchronize_session=False)
+    return moved
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+class ListPartitions(Command):
+    """List the shows partitions with their estimated row counts"""
+
+    def run(self):
+        if not is_partitioned():
+            sys.exit('shows is not partitioned')
+        for name, month in partitions() + [('shows_default', None)]:
+            rows = db.session.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = :name",
+                                      {'name': name}).scalar()
+            label = '{0:%Y-%m}'.format(month) if month else 'other'
+            print('{0:<16} {1:<8} ~{2} rows'.format(name, label, rows))
+
+
+PartitionCommand.add_command('list', ListPartitions())
+
+
+@PartitionCommand.option('--months-ahead', dest='months_ahead', type=int, default=3)
+def create(months_ahead):
+    """Create the monthly partitions for the coming months (run monthly)"""
+    if not is_partitioned():
+        sys.exit('shows is not partitioned')
+    created = create_partitions(months_ahead)
+    db.session.commit()
+    print('created ' + ', '.join(created) if created else 'partitions already exist')
+
+
+@PartitionCommand.option('--before', dest='before', default=None,
+                          help='YYYY-MM-DD, defaults to SHOWS_ARCHIVE_AFTER_DAYS ago')
+@PartitionCommand.option('--dump', dest='dump', default=None, help='also write the archived shows to this JSONL file')
+def archive(before, dump):
+    """Move past shows into shows_archive"""
+    if before:
+        before = datetime.strptime(before, '%Y-%m-%d')
+    else:
+        before = datetime.now() - timedelta(days=current_app.config.get('SHOWS_ARCHIVE_AFTER_DAYS', 365))
+    if before > datetime.now():
+        sys.exit('only past shows can be archived')
+    if dump:
+        with open(dump, 'a', encoding='utf-8') as stream:
+            print('{0} shows written to {1}'.format(dump_shows(stream, before), dump), file=sys.stderr)
+    moved = archive_shows(before)
+    db.session.commit()
+    print('{0} shows archived'.format(moved), file=sys.stderr)
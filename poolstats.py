@@ -0,0 +1,72 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from models import db
+
+# Connection pool metrics, collected through pool events so the engine can still be
+# created lazily on first use.
+
+
+class PoolStats(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checkedOut = 0
+        self.peakCheckedOut = 0
+        self.heldSeconds = 0.0
+        self.installed = False
+
+    def install(self):
+        if self.installed:
+            return
+        event.listen(Pool, 'connect', self._connect)
+        event.listen(Pool, 'checkout', self._checkout)
+        event.listen(Pool, 'checkin', self._checkin)
+        event.listen(Pool, 'invalidate', self._invalidate)
+        self.installed = True
+
+    def _connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connects += 1
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.time()
+        with self.lock:
+            self.checkouts += 1
+            self.checkedOut += 1
+            self.peakCheckedOut = max(self.peakCheckedOut, self.checkedOut)
+
+    def _checkin(self, dbapi_connection, connection_record):
+        checkedOutAt = connection_record.info.pop('checked_out_at', None)
+        with self.lock:
+            self.checkins += 1
+            if checkedOutAt is not None:
+                self.checkedOut -= 1
+                self.heldSeconds += time.time() - checkedOutAt
+
+    def _invalidate(self, dbapi_connection, connection_record, exception):
+        with self.lock:
+            self.invalidations += 1
+
+    def stats(self):
+        pool = db.engine.pool
+        return {
+            "pool": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, 'size') else None,
+            "overflow": pool.overflow() if hasattr(pool, 'overflow') else None,
+            "checked_out": self.checkedOut,
+            "peak_checked_out": self.peakCheckedOut,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "avg_held_ms": 1000 * self.heldSeconds / self.checkins if self.checkins else 0.0,
+        }
+
+
+poolStats = PoolStats()
@@ -0,0 +1,122 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL profiling.
+#
+# Engine events count the statements every request runs and the time spent in the
+# database. Statements are reduced to a shape (whitespace and IN lists collapsed)
+# so a query repeated inside a loop -- the N+1 pattern -- shows up as one shape
+# with a high count. Totals go out in a Server-Timing header, recent profiles are
+# kept for /debug/sql, and SQL_QUERY_BUDGET / SQL_REPEAT_LIMIT either log a
+# warning or raise, depending on SQL_BUDGET_MODE.
+
+log = logging.getLogger(__name__)
+
+inList = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)')
+whitespace = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def statement_shape(statement):
+    return inList.sub('(...)', whitespace.sub(' ', statement).strip())
+
+
+class SQLProfiler(object):
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.budget = 0
+        self.repeatLimit = 0
+        self.mode = 'warn'
+        self.history = deque(maxlen=50)
+        self.lock = threading.Lock()
+        self.installed = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_PROFILER', True)
+        self.budget = app.config.get('SQL_QUERY_BUDGET', 0)
+        self.repeatLimit = app.config.get('SQL_REPEAT_LIMIT', 0)
+        self.mode = app.config.get('SQL_BUDGET_MODE', 'warn')
+        self.history = deque(maxlen=app.config.get('SQL_PROFILER_HISTORY', 50))
+        app.extensions['sql_profiler'] = self
+        if not self.enabled:
+            return
+        if not self.installed:
+            # listening on the Engine class covers the primary, replicas and
+            # engines created after start-up
+            event.listen(Engine, 'before_cursor_execute', self._before)
+            event.listen(Engine, 'after_cursor_execute', self._after)
+            self.installed = True
+        app.after_request(self.finish_request)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['profiler_start'].pop()
+        if not has_request_context():
+            return
+        profile = g.get('sql_profile')
+        if profile is None:
+            profile = g.sql_profile = {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+        profile['count'] += 1
+        profile['seconds'] += elapsed
+        profile['shapes'][statement_shape(statement)] += 1
+
+    def problems(self, profile):
+        found = []
+        if self.budget and profile['count'] > self.budget:
+            found.append('{0} queries (budget {1})'.format(profile['count'], self.budget))
+        if self.repeatLimit:
+            for shape, count in profile['shapes'].most_common():
+                if count <= self.repeatLimit:
+                    break
+                found.append('{0} x {1}'.format(count, shape))
+        return found
+
+    def finish_request(self, response):
+        # popped, as requests made from a CLI command (test client) share its g
+        profile = g.pop('sql_profile', None) or {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+        if response.is_streamed:
+            # a streamed page runs its queries while the body is sent, after this hook
+            return response
+        response.headers.add('Server-Timing', 'db;dur={0:.1f};desc="{1} queries"'.format(
+            profile['seconds'] * 1000, profile['count']))
+        if request.endpoint == 'sql_profile':
+            return response
+        problems = self.problems(profile)
+        with self.lock:
+            self.history.append({
+                "method": request.method,
+                "path": request.full_path.rstrip('?'),
+                "status": response.status_code,
+                "queries": profile['count'],
+                "db_ms": round(profile['seconds'] * 1000, 2),
+                "repeated": [{"count": count, "statement": shape}
+                             for shape, count in profile['shapes'].most_common(5) if count > 1],
+                "problems": problems,
+            })
+        if problems:
+            message = '{0} {1}: {2}'.format(request.method, request.path, '; '.join(problems))
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            log.warning('query budget exceeded on %s', message)
+        return response
+
+    def recent(self):
+        with self.lock:
+            return list(reversed(self.history))
+
+
+sqlProfiler = SQLProfiler()
@@ -0,0 +1,374 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import func, select, tuple_, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from models import db, Venue, Artist, Show, ShowArchive
+
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    # raises ValueError on anything that is not a cursor issued by encode_cursor
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor: {0}'.format(cursor))
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor: {0}'.format(cursor))
+    for i, column in enumerate(columns):
+        value, pythonType = values[i], column.type.python_type
+        if value is None:
+            continue
+        if pythonType is datetime and isinstance(value, str):
+            values[i] = datetime.fromisoformat(value)
+        elif pythonType is float and isinstance(value, int) and not isinstance(value, bool):
+            values[i] = float(value)
+        elif not isinstance(value, pythonType) or (isinstance(value, bool) and pythonType is not bool):
+            # a value the database could not compare with the column
+            raise ValueError('Invalid cursor: {0}'.format(cursor))
+    return values
+
+
+def keyset_query(query, columns, after=None, before=None, limit=50):
+    # seeks past the cursor on a unique, ascending ordering instead of using OFFSET,
+    # fetching one extra row to tell whether another page follows
+    key = tuple_(*columns)
+    query = query.order_by(None)
+    if before:
+        return query.filter(key < tuple_(*decode_cursor(before, columns))) \
+            .order_by(*[column.desc() for column in columns]).limit(limit + 1)
+    if after:
+        query = query.filter(key > tuple_(*decode_cursor(after, columns)))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def keyset_page(query, columns, after=None, before=None, limit=50):
+    # rows must expose each ordering column under its column key
+    rows = keyset_query(query, columns, after, before, limit).all()
+    if before:
+        hasPrev, hasNext = len(rows) > limit, True
+        rows = rows[:limit]
+        rows.reverse()
+    else:
+        hasPrev, hasNext = bool(after), len(rows) > limit
+        rows = rows[:limit]
+    if not rows:
+        return Page(rows, None, None)
+    cursorOf = lambda row: encode_cursor([getattr(row, column.key) for column in columns])
+    return Page(rows, cursorOf(rows[-1]) if hasNext else None, cursorOf(rows[0]) if hasPrev else None)
+
+
+def stream_query(query, batch=1000):
+    # rows through a server-side cursor, `batch` at a time, for streamed pages
+    return query.execution_options(stream_results=True).yield_per(batch)
+
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+def venue_areas_query():
+    # one row per venue ordered so that venues of the same area are adjacent
+    return db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).order_by(Venue.state, Venue.city, Venue.id)
+
+
+def group_by_area(rows):
+    # folds (state, city) ordered venue rows into the structure pages/venues.html expects
+    areas = []
+    for row in rows:
+        if not areas or (areas[-1]['city'], areas[-1]['state']) != (row.city, row.state):
+            areas.append({"city": row.city, "state": row.state, "venues": []})
+        areas[-1]['venues'].append({"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows})
+    return areas
+
+
+def stream_areas(rows):
+    # group_by_area for a stream: one area at a time, with its venues read as the
+    # template loops over them
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        yield {"city": city, "state": state, "venues": (
+            {"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows} for row in venues)}
+
+
+def venue_areas():
+    return group_by_area(venue_areas_query().all())
+
+
+def venue_areas_page(after=None, before=None, limit=50):
+    page = keyset_page(venue_areas_query(), [Venue.state, Venue.city, Venue.id], after, before, limit)
+    return page._replace(items=group_by_area(page.items))
+
+
+def genre_query(model, genre):
+    # venues or artists listing a genre; `genres @> ARRAY[genre]` is served by the
+    # GIN index on the genres array
+    return db.session.query(
+        model.id, model.name, model.city, model.state,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(model.genres.contains([genre]))
+
+
+def genre_page(model, genre, after=None, before=None, limit=50):
+    return keyset_page(genre_query(model, genre), [model.id], after, before, limit)
+
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+def artists_page(after=None, before=None, limit=50):
+    return keyset_page(db.session.query(Artist.id, Artist.name), [Artist.id], after, before, limit)
+
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+def upcoming_shows_query(now=None):
+    # upcoming shows joined to their venue and artist in a single query
+    now = now or datetime.now()
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Venue, Venue.id == Show.venue_id) \
+     .join(Artist, Artist.id == Show.artist_id) \
+     .filter(Show.start_time > now)
+
+
+def upcoming_shows_page(after=None, before=None, limit=50, now=None):
+    page = keyset_page(upcoming_shows_query(now), [Show.start_time, Show.id], after, before, limit)
+    return page._replace(items=[{
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    } for row in page.items])
+
+
+def insert_unique(model, values):
+    # inserts a venue or artist unless its name is taken (case-insensitively) and
+    # returns the new id, or None on a duplicate. The unique lower(name) index decides,
+    # so concurrent submissions cannot both pass a check-then-insert. Caller commits.
+    table = model.__table__
+    if db.session.get_bind().dialect.name == 'postgresql':
+        statement = postgresql.insert(table).values(**values) \
+            .on_conflict_do_nothing(index_elements=[func.lower(table.c.name)]) \
+            .returning(table.c.id)
+        return db.session.execute(statement).scalar()
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(table.insert().values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        return None
+
+
+#----------------------------------------------------------------------------#
+# Calendar.
+#----------------------------------------------------------------------------#
+
+def calendar_query(start, end, city=None, state=None, genre=None, venue_id=None):
+    # shows starting in [start, end) with their venue and artist, archived ones
+    # included. The range is a scan of ix_shows_start_time_id (and its archive
+    # twin), or of the venue_id/start_time indexes per venue when a venue or a city
+    # (ix_venues_state_city_id) narrows it down
+    shows = allShows
+    query = db.session.query(
+        shows.c.id,
+        shows.c.start_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.address.label('venue_address'),
+        Venue.city,
+        Venue.state,
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name')
+    ).select_from(shows) \
+     .join(Venue, Venue.id == shows.c.venue_id) \
+     .join(Artist, Artist.id == shows.c.artist_id) \
+     .filter(shows.c.start_time >= start, shows.c.start_time < end)
+    if venue_id is not None:
+        query = query.filter(shows.c.venue_id == venue_id)
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+    if genre:
+        query = query.filter(Artist.genres.contains([genre]))
+    return query
+
+
+def calendar_page(query, after=None, before=None, limit=50):
+    return keyset_page(query, [allShows.c.start_time, allShows.c.id], after, before, limit)
+
+
+def calendar_events(query, limit):
+    # every show of a calendar query in start order, for the iCalendar feed
+    return query.order_by(allShows.c.start_time, allShows.c.id).limit(limit).all()
+
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def all_shows():
+    # live and archived shows as one selectable; the venue/artist filters are pushed
+    # into both branches, so each side stays an index scan
+    columns = ['id', 'venue_id', 'artist_id', 'start_time']
+    return union_all(
+        select([Show.__table__.c[column] for column in columns]),
+        select([ShowArchive.__table__.c[column] for column in columns])
+    ).alias('all_shows')
+
+
+# for queries whose callers page or order by its columns
+allShows = all_shows()
+
+
+def venue_shows_query(venue_id, now=None):
+    # shows of a venue joined to their artist, flagged upcoming/past by the database
+    now = now or datetime.now()
+    shows = all_shows()
+    return db.session.query(
+        shows.c.start_time,
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        (shows.c.start_time > now).label('upcoming')
+    ).select_from(shows) \
+     .join(Artist, Artist.id == shows.c.artist_id) \
+     .filter(shows.c.venue_id == venue_id) \
+     .order_by(shows.c.start_time)
+
+
+def artist_shows_query(artist_id, now=None):
+    # shows of an artist joined to their venue, flagged upcoming/past by the database
+    now = now or datetime.now()
+    shows = all_shows()
+    return db.session.query(
+        shows.c.start_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        (shows.c.start_time > now).label('upcoming')
+    ).select_from(shows) \
+     .join(Venue, Venue.id == shows.c.venue_id) \
+     .filter(shows.c.artist_id == artist_id) \
+     .order_by(shows.c.start_time)
+
+
+def split_shows(rows, fields):
+    pastShows, upcomingShows = [], []
+    for row in rows:
+        show = {field: getattr(row, field) for field in fields}
+        show["start_time"] = row.start_time
+        if row.upcoming:
+            upcomingShows.append(show)
+        else:
+            pastShows.append(show)
+    return pastShows, upcomingShows
+
+
+def venue_detail(venue_id, now=None):
+    # two queries regardless of how many shows the venue has
+    venue = Venue.query.get(venue_id)
+    if venue is None:
+        return None
+    pastShows, upcomingShows = split_shows(
+        venue_shows_query(venue_id, now), ['artist_id', 'artist_name', 'artist_image_link'])
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres or [],
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "facebook_link": venue.facebook_link,
+        "website_link": venue.website_link,
+        "image_link": venue.image_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "past_shows": pastShows,
+        "upcoming_shows": upcomingShows,
+        "past_shows_count": len(pastShows),
+        "upcoming_shows_count": len(upcomingShows),
+    }
+
+
+def artist_detail(artist_id, now=None):
+    # two queries regardless of how many shows the artist has
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        return None
+    pastShows, upcomingShows = split_shows(
+        artist_shows_query(artist_id, now), ['venue_id', 'venue_name', 'venue_image_link'])
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres or [],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "facebook_link": artist.facebook_link,
+        "website_link": artist.website_link,
+        "image_link": artist.image_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "past_shows": pastShows,
+        "upcoming_shows": upcomingShows,
+        "past_shows_count": len(pastShows),
+        "upcoming_shows_count": len(upcomingShows),
+    }
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+def refresh_upcoming_counts(venue_ids=None, artist_ids=None, now=None):
+    # recounts Venue/Artist.upcoming_shows_count from the shows table; ids limit the
+    # refresh to those rows, None refreshes every row. Caller commits.
+    now = now or datetime.now()
+    for model, foreignKey, ids in [(Venue, Show.venue_id, venue_ids), (Artist, Show.artist_id, artist_ids)]:
+        if ids is not None and not ids:
+            continue
+        upcomingShows = db.session.query(func.count(Show.id)) \
+            .filter(foreignKey == model.id, Show.start_time > now).as_scalar()
+        update = model.__table__.update().values(upcoming_shows_count=upcomingShows)
+        if ids is not None:
+            update = update.where(model.id.in_(ids))
+        db.session.execute(update)
+
+
+def show_partners_query(foreignKey, partnerKey, entity_id):
+    # archived shows count too, the detail pages list them
+    return db.session.query(allShows.c[partnerKey.key]).distinct().filter(allShows.c[foreignKey.key] == entity_id)
+
+
+def show_partners(foreignKey, partnerKey, entity_id):
+    # ids on the other side of an entity's shows, e.g. the artists playing at a venue
+    return [row[0] for row in show_partners_query(foreignKey, partnerKey, entity_id)]
@@ -0,0 +1,151 @@
+import logging
+import random
+import threading
+import time
+from flask import current_app, g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm
+from sqlalchemy.exc import DBAPIError
+
+# Read-replica routing.
+#
+# GET/HEAD requests, and views marked with @replicas.read_only such as the search
+# forms' POSTs, run their queries on one of SQLALCHEMY_REPLICA_URLS; every other
+# request, flushes, CLI commands and requests made shortly after a write by
+# the same browser (read-your-writes) use the primary. A replica is checked at most
+# every REPLICA_CHECK_SECONDS; one that cannot be reached is skipped for
+# REPLICA_RETRY_SECONDS and its reads fall back to the primary.
+
+log = logging.getLogger(__name__)
+
+readMethods = ('GET', 'HEAD', 'OPTIONS')
+stickyCookie = 'fyyur_primary_until'
+
+
+def engine_options(url, options):
+    # SQLite does not use a QueuePool, so the sizing options do not apply
+    options = dict(options or {})
+    if url.startswith('sqlite'):
+        for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(option, None)
+    return options
+
+
+class ReplicaSet(object):
+
+    def __init__(self):
+        self.urls = []
+        self.options = {}
+        self._engines = None
+        self.downUntil = []
+        self.checkedAt = []
+        self.stickySeconds = 10
+        self.retrySeconds = 30
+        self.checkSeconds = 5
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.urls = list(app.config.get('SQLALCHEMY_REPLICA_URLS') or [])
+        self.options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self._engines = None
+        self.downUntil = [0.0] * len(self.urls)
+        self.checkedAt = [0.0] * len(self.urls)
+        self.stickySeconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+        self.retrySeconds = app.config.get('REPLICA_RETRY_SECONDS', 30)
+        self.checkSeconds = app.config.get('REPLICA_CHECK_SECONDS', 5)
+        app.after_request(self.stick_after_write)
+        app.extensions['replicas'] = self
+
+    @property
+    def engines(self):
+        # created on first use, like the primary engine
+        if self._engines is None:
+            with self.lock:
+                if self._engines is None:
+                    self._engines = [create_engine(url, **engine_options(url, self.options)) for url in self.urls]
+        return self._engines
+
+    def read_only(self, view):
+        # marks a view that only reads whatever its method, so it is served from a
+        # replica and does not pin the browser to the primary
+        view.read_only = True
+        return view
+
+    def read_request(self):
+        if request.method in readMethods:
+            return True
+        return getattr(current_app.view_functions.get(request.endpoint), 'read_only', False)
+
+    def pinned(self):
+        # True when the browser wrote recently and must read from the primary
+        if not self.urls or not has_request_context():
+            return False
+        try:
+            return float(request.cookies.get(stickyCookie, 0)) >= time.time()
+        except ValueError:
+            return False
+
+    def reading(self):
+        # True when the current request may be served from a replica
+        if not self.urls or not has_request_context() or not self.read_request():
+            return False
+        return not self.pinned()
+
+    def served_from_replica(self):
+        return has_request_context() and g.get('replica') is not None
+
+    def choose(self):
+        # one healthy replica per request, picked at random; None means use the primary
+        if 'replica' in g:
+            return g.replica
+        g.replica = None
+        now = time.time()
+        candidates = [i for i, downUntil in enumerate(self.downUntil) if downUntil <= now]
+        random.shuffle(candidates)
+        for i in candidates:
+            # a replica that answered within REPLICA_CHECK_SECONDS is used unchecked
+            if self.checkedAt[i] + self.checkSeconds <= now:
+                try:
+                    self.engines[i].connect().close()
+                except DBAPIError as error:
+                    log.warning('replica %d unavailable, reading from the primary: %s', i, error)
+                    with self.lock:
+                        self.downUntil[i] = now + self.retrySeconds
+                    continue
+                with self.lock:
+                    self.checkedAt[i] = now
+            g.replica = self.engines[i]
+            break
+        return g.replica
+
+    def stick_after_write(self, response):
+        # the redirect after a successful submission pins this browser to the
+        # primary until the replicas have caught up
+        if self.urls and not self.read_request() and response.status_code < 400:
+            until = time.time() + self.stickySeconds
+            response.set_cookie(stickyCookie, '{0:.3f}'.format(until), max_age=int(self.stickySeconds) + 1,
+                                httponly=True)
+        return response
+
+    def status(self):
+        now = time.time()
+        return [{"replica": i, "healthy": downUntil <= now} for i, downUntil in enumerate(self.downUntil)]
+
+
+replicas = ReplicaSet()
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and replicas.reading():
+            replica = replicas.choose()
+            if replica is not None:
+                return replica
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
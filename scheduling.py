@@ -0,0 +1,166 @@
+import bisect
+from collections import defaultdict
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select, literal, union_all, or_
+from models import db, Venue, Artist, Show
+from cache import responseCache
+from customValidator import validate
+from forms import ShowForm
+import queries
+
+# Show scheduling with conflict detection.
+#
+# A batch of shows is validated like the show form, checked against the venues
+# and artists tables in one query and against the shows already booked, then
+# inserted in the caller's transaction. Every show is taken to last
+# SHOW_DURATION_MINUTES, and a venue or an artist cannot have two shows that
+# overlap. `shows` is partitioned by start_time, where PostgreSQL cannot enforce
+# an exclusion constraint, so the check is done here: on PostgreSQL the venues
+# and artists of a batch are locked (transaction advisory locks) first, so two
+# concurrent batches cannot both book the same slot.
+
+venueLock = 1
+artistLock = 2
+
+
+class Bookings(object):
+    # start times per venue or artist, kept sorted. All shows last the same time,
+    # so a new show can only overlap its neighbours in start-time order
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.starts = defaultdict(list)
+
+    def add(self, key, start):
+        bisect.insort(self.starts[key], start)
+
+    def clash(self, key, start):
+        # start time of a booked show overlapping a show at `start`, or None
+        starts = self.starts.get(key)
+        if not starts:
+            return None
+        i = bisect.bisect_left(starts, start)
+        for booked in starts[max(i - 1, 0):i + 1]:
+            if abs(booked - start) < self.duration:
+                return booked
+        return None
+
+
+def show_record(row):
+    # (record, error) for one {'artist_id', 'venue_id', 'start_time'} row, with the
+    # show form's rules; start_time is 'YYYY-MM-DD HH:MM:SS'
+    if not isinstance(row, dict):
+        return None, 'expected an object with artist_id, venue_id and start_time.'
+    form, error = validate(ShowForm, row)
+    if error:
+        return None, error
+    try:
+        return {'artist_id': int(form.artist_id.data), 'venue_id': int(form.venue_id.data),
+                'start_time': form.start_time.data}, None
+    except (TypeError, ValueError):
+        return None, 'artist_id and venue_id must be integers.'
+
+
+def lock_bookings(venueIds, artistIds):
+    # serializes scheduling per venue and artist until the transaction ends; the
+    # locks are taken in one sorted pass so two batches cannot deadlock
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    keys = sorted([(venueLock, venueId) for venueId in venueIds] + [(artistLock, artistId) for artistId in artistIds])
+    db.session.execute(
+        'SELECT pg_advisory_xact_lock(kind, id) FROM ('
+        'SELECT * FROM unnest(CAST(:kinds AS integer[]), CAST(:ids AS integer[])) AS k(kind, id) '
+        'ORDER BY kind, id) AS sorted', {'kinds': [kind for kind, _ in keys], 'ids': [key for _, key in keys]})
+
+
+def existing_ids(venueIds, artistIds):
+    # the venue ids and artist ids that exist, in one query
+    found = {venueLock: set(), artistLock: set()}
+    rows = db.session.execute(union_all(
+        select([literal(venueLock), Venue.id]).where(Venue.id.in_(sorted(venueIds))),
+        select([literal(artistLock), Artist.id]).where(Artist.id.in_(sorted(artistIds)))))
+    for kind, entityId in rows:
+        found[kind].add(entityId)
+    return found[venueLock], found[artistLock]
+
+
+def booked(records, duration):
+    # Bookings of the batch's venues and artists around the batch's dates
+    venueBookings, artistBookings = Bookings(duration), Bookings(duration)
+    starts = [record['start_time'] for record in records]
+    rows = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(
+        or_(Show.venue_id.in_(sorted({record['venue_id'] for record in records})),
+            Show.artist_id.in_(sorted({record['artist_id'] for record in records}))),
+        Show.start_time > min(starts) - duration, Show.start_time < max(starts) + duration)
+    for venueId, artistId, start in rows:
+        venueBookings.add(venueId, start)
+        artistBookings.add(artistId, start)
+    return venueBookings, artistBookings
+
+
+def conflict(record, knownVenues, knownArtists, venueBookings, artistBookings):
+    # why a show cannot be booked, or None
+    if record['venue_id'] not in knownVenues:
+        return 'Venue with ID {0} does not exist.'.format(record['venue_id'])
+    if record['artist_id'] not in knownArtists:
+        return 'Artist with ID {0} does not exist.'.format(record['artist_id'])
+    clash = venueBookings.clash(record['venue_id'], record['start_time'])
+    if clash:
+        return 'Venue {0} already has a show at {1:%Y-%m-%d %H:%M}.'.format(record['venue_id'], clash)
+    clash = artistBookings.clash(record['artist_id'], record['start_time'])
+    if clash:
+        return 'Artist {0} already plays at {1:%Y-%m-%d %H:%M}.'.format(record['artist_id'], clash)
+    return None
+
+
+def schedule_shows(rows, partial=False):
+    # validates (row number, row) pairs and inserts the shows that pass; returns
+    # (inserted records, [(row number, error)]). Unless `partial`, one error
+    # rejects the whole batch. Caller commits, or rolls back on errors
+    errors = []
+    records = []
+    for rowNo, row in rows:
+        record, error = show_record(row)
+        if error:
+            errors.append((rowNo, error))
+        else:
+            records.append((rowNo, record))
+    return schedule_records(records, partial, errors)
+
+
+def schedule_records(records, partial=False, errors=()):
+    # schedule_shows() for (row number, record) pairs that already passed the show
+    # form's rules; `errors` are the rows rejected before
+    duration = timedelta(minutes=current_app.config.get('SHOW_DURATION_MINUTES', 120))
+    errors = list(errors)
+    accepted = []
+    if records:
+        venueIds = {record['venue_id'] for _, record in records}
+        artistIds = {record['artist_id'] for _, record in records}
+        lock_bookings(venueIds, artistIds)
+        knownVenues, knownArtists = existing_ids(venueIds, artistIds)
+        venueBookings, artistBookings = booked([record for _, record in records], duration)
+        for rowNo, record in records:
+            error = conflict(record, knownVenues, knownArtists, venueBookings, artistBookings)
+            if error:
+                errors.append((rowNo, error))
+                continue
+            # later rows of the batch are checked against the accepted ones
+            venueBookings.add(record['venue_id'], record['start_time'])
+            artistBookings.add(record['artist_id'], record['start_time'])
+            accepted.append(record)
+    errors.sort()
+    if not accepted or (errors and not partial):
+        return [], errors
+    db.session.execute(Show.__table__.insert(), accepted)
+    queries.refresh_upcoming_counts(venue_ids=list({record['venue_id'] for record in accepted}),
+                                    artist_ids=list({record['artist_id'] for record in accepted}))
+    return accepted, errors
+
+
+def shows_changed(records):
+    # drops the cached pages showing the venues and artists of new shows
+    tags = {'venue:{0}'.format(record['venue_id']) for record in records} | \
+        {'artist:{0}'.format(record['artist_id']) for record in records}
+    responseCache.invalidate('venues', 'shows', *sorted(tags))
@@ -0,0 +1,161 @@
+import bisect
+from functools import partial
+from flask import current_app
+from sqlalchemy import Float, Integer, cast, literal_column, or_, func
+from models import db, Venue, Artist
+from background import BackgroundIndex, cooperative
+import queries
+
+# Case-insensitive substring search over name, city and state.
+#
+# On PostgreSQL the ILIKE filters are served by the pg_trgm GIN indexes created in
+# migration 3c1f7d2a8b4e and results are ranked by trigram similarity. Other
+# databases (SQLite test runs) use an in-process trigram inverted index per table,
+# a background.BackgroundIndex invalidated by the write views and rebuilt every
+# SEARCH_MAX_AGE seconds.
+
+searchFields = ('name', 'city', 'state')
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(object):
+
+    def __init__(self, rows):
+        # rows are (id, name, city, state) tuples
+        self.docs = {}
+        self.postings = {}
+        for row in rows:
+            fields = tuple((value or '').lower() for value in row[1:])
+            self.docs[row[0]] = fields
+            for field in fields:
+                for gram in trigrams(field):
+                    self.postings.setdefault(gram, set()).add(row[0])
+
+    def candidates(self, term):
+        grams = trigrams(term)
+        if not grams:
+            return self.docs.keys()
+        # intersect the shortest posting lists first
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def search(self, term):
+        # ids whose name, city or state contain the term, best matches first
+        return [docId for _, _, docId in self.ranked(term)]
+
+    def ranked(self, term):
+        # sorted (rank, name, id) keys of the matches
+        term = term.lower()
+        ranked = []
+        for docId in self.candidates(term):
+            name, city, state = self.docs[docId]
+            if term in name:
+                rank = 0 if name.startswith(term) else 1
+            elif term in city or term in state:
+                rank = 2
+            else:
+                continue
+            ranked.append((rank, name, docId))
+        ranked.sort()
+        return ranked
+
+
+def build(model):
+    return TrigramIndex(cooperative(db.session.query(model.id, model.name, model.city, model.state)
+                                    .execution_options(stream_results=True).yield_per(10000)))
+
+
+indexes = {model: BackgroundIndex('{0} search index'.format(model.__tablename__), partial(build, model),
+                                  'SEARCH_MAX_AGE')
+           for model in (Venue, Artist)}
+
+
+def invalidate(model):
+    indexes[model].invalidate()
+
+
+def get_index(model):
+    return indexes[model].get()
+
+
+def use_database():
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return db.session.get_bind().dialect.name == 'postgresql'
+    return backend == 'database'
+
+
+def matches(model, term):
+    pattern = "%{}%".format(term)
+    return or_(*[getattr(model, field).ilike(pattern) for field in searchFields])
+
+
+def similarity(model, term):
+    return func.greatest(*[func.similarity(getattr(model, field), term) for field in searchFields])
+
+
+def ilike_query(model, term):
+    return model.query.filter(matches(model, term))
+
+
+def ranked_query(model, term):
+    return ilike_query(model, term).order_by(similarity(model, term).desc(), model.id)
+
+
+def search(model, term):
+    # returns matching model instances, best matches first
+    if use_database():
+        return ranked_query(model, term).all()
+    ids = get_index(model).search(term)
+    if not ids:
+        return []
+    byId = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+    return [byId[i] for i in ids if i in byId]
+
+
+def summary_columns(model):
+    return [model.id, model.name, model.city, model.state, model.upcoming_shows_count]
+
+
+def search_page(model, term, after=None, before=None, limit=50):
+    # a keyset Page of matching (id, name, city, state, upcoming_shows_count) rows,
+    # best matches first; the cursors carry the rank so each page is one bounded query
+    if use_database():
+        # double precision, so the rank in a cursor compares equal to the row's
+        rank = (-cast(similarity(model, term), Float)).label('search_rank')
+        query = db.session.query(*summary_columns(model) + [rank]).filter(matches(model, term))
+        return queries.keyset_page(query, [rank, model.id], after, before, limit)
+    keys = get_index(model).ranked(term)
+    columns = [literal_column('rank', Integer), model.name, model.id]
+    if before:
+        stop = bisect.bisect_left(keys, tuple(queries.decode_cursor(before, columns)))
+        start = max(0, stop - limit)
+        hasPrev, hasNext = start > 0, True
+    else:
+        start = bisect.bisect_right(keys, tuple(queries.decode_cursor(after, columns))) if after else 0
+        stop = start + limit
+        hasPrev, hasNext = bool(after), stop < len(keys)
+    keys = keys[start:stop]
+    if not keys:
+        return queries.Page([], None, None)
+    byId = {row.id: row for row in db.session.query(*summary_columns(model))
+            .filter(model.id.in_([docId for _, _, docId in keys]))}
+    return queries.Page([byId[docId] for _, _, docId in keys if docId in byId],
+                        queries.encode_cursor(keys[-1]) if hasNext else None,
+                        queries.encode_cursor(keys[0]) if hasPrev else None)
+
+
+def search_venues(term):
+    return search(Venue, term)
+
+
+def search_artists(term):
+    return search(Artist, term)
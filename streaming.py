@@ -0,0 +1,27 @@
+from flask import Response, current_app, request, stream_with_context
+
+# Streamed list pages.
+#
+# With ?limit=all the venue, artist and show lists are rendered while the rows
+# arrive: the view hands the template a generator over a server-side cursor
+# (queries.stream_query) and stream_template sends the page out in chunks as
+# Jinja renders it. The first bytes leave before the query has finished, and
+# memory stays flat however many rows there are. Streamed pages are not kept in
+# the response cache.
+
+# template events (text runs and expressions) per chunk written to the socket
+bufferSize = 64
+
+
+def wants_stream():
+    return request.args.get('limit') == 'all' and current_app.config.get('STREAM_PAGES', True)
+
+
+def stream_template(template_name, **context):
+    # render_template for a streamed response. The request context stays open
+    # until the last chunk, so the template can keep reading from the database
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(bufferSize)
+    return Response(stream_with_context(stream), mimetype='text/html')
@@ -0,0 +1,223 @@
+import bisect
+import heapq
+import sys
+from itertools import islice
+from models import db, Venue, Artist
+from background import BackgroundIndex, cooperative
+
+# Type-ahead suggestions over venue names, artist names and cities.
+#
+# Whole names and cities, and names from each of their other words ("The Blue
+# Note" is also found under "blue note" and "note"), are keys in sorted lists, so
+# a prefix is answered with a bisect and a short scan. The index is built by the
+# gunicorn warm-up or the first lookup. The write views apply their own changes
+# to it with changed(), and as a background.BackgroundIndex it is rebuilt every
+# SUGGEST_MAX_AGE seconds to pick up the writes other workers served.
+
+kinds = {Venue: 'venue', Artist: 'artist'}
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+class SortedKeys(object):
+    # a sorted list of strings kept in blocks of up to 2 * blockSize, so an insert
+    # or a delete shifts one short list rather than millions of slots
+
+    blockSize = 1000
+    # keys sorted per step of a build; sorting millions at once would hold the GIL
+    # (or, under gevent, the worker) for seconds
+    runSize = 20000
+
+    def __init__(self, keys=()):
+        keys = list(keys)
+        runs = [sorted(keys[i:i + self.runSize]) for i in cooperative(range(0, len(keys), self.runSize), 1)]
+        merged = heapq.merge(*runs)
+        self.blocks = list(cooperative(iter(lambda: list(islice(merged, self.blockSize)), []), 10))
+        self.maxes = [block[-1] for block in self.blocks]
+        self.size = len(keys)
+
+    def insert(self, key):
+        if not self.blocks:
+            self.blocks.append([key])
+            self.maxes.append(key)
+        else:
+            j = min(bisect.bisect_left(self.maxes, key), len(self.blocks) - 1)
+            block = self.blocks[j]
+            bisect.insort(block, key)
+            self.maxes[j] = block[-1]
+            if len(block) > 2 * self.blockSize:
+                self.blocks[j:j + 1] = [block[:self.blockSize], block[self.blockSize:]]
+                self.maxes[j:j + 1] = [block[self.blockSize - 1], block[-1]]
+        self.size += 1
+
+    def delete(self, key):
+        j = bisect.bisect_left(self.maxes, key)
+        if j == len(self.blocks):
+            return
+        block = self.blocks[j]
+        i = bisect.bisect_left(block, key)
+        if i == len(block) or block[i] != key:
+            return
+        del block[i]
+        if block:
+            self.maxes[j] = block[-1]
+        else:
+            del self.blocks[j]
+            del self.maxes[j]
+        self.size -= 1
+
+    def scan(self, prefix):
+        # the keys starting with prefix, in order
+        j = bisect.bisect_left(self.maxes, prefix)
+        if j == len(self.blocks):
+            return
+        i = bisect.bisect_left(self.blocks[j], prefix)
+        while j < len(self.blocks):
+            block = self.blocks[j]
+            while i < len(block):
+                if not block[i].startswith(prefix):
+                    return
+                yield block[i]
+                i += 1
+            i = 0
+            j += 1
+
+    def __len__(self):
+        return self.size
+
+
+class PrefixIndex(object):
+    # whole names and cities in `names`, names from their second, third... word
+    # on in `words`. A key is the text, a NUL and "v<id>" or "a<id>" (or "c" for a
+    # city), so it is unique and its suggestion can be found from it
+
+    def __init__(self, rows=()):
+        # rows are (kind, id, name, city, state) tuples
+        self.entries = {}
+        self.cities = {}
+        names, words = [], []
+        for row in cooperative(rows):
+            entryNames, entryWords = self._entry(*row)
+            names += entryNames
+            words += entryWords
+        self.names = SortedKeys(names)
+        self.words = SortedKeys(words)
+
+    def _keys(self, tag, name):
+        # (name keys, word keys) of an entity
+        words = normalize(name).split(' ')
+        return (['{0}\0{1}'.format(' '.join(words), tag)],
+                ['{0}\0{1}'.format(' '.join(words[i:]), tag) for i in range(1, len(words))])
+
+    def _entry(self, kind, entityId, name, city, state):
+        # records an entity and returns its keys, with its city's when it is the
+        # first entity there; cities are reference counted
+        tag = '{0}{1}'.format(kind[0], entityId)
+        names, words = self._keys(tag, name)
+        cityKey = None
+        if city and state:
+            label = '{0}, {1}'.format(city.strip(), state)
+            # one string per city rather than one per entity
+            cityKey = sys.intern('{0}\0c'.format(normalize(label)))
+            if cityKey in self.cities:
+                self.cities[cityKey][1] += 1
+            else:
+                self.cities[cityKey] = [label, 1]
+                names.append(cityKey)
+        self.entries[tag] = (name, cityKey)
+        return names, words
+
+    def add(self, kind, entityId, name, city, state):
+        # adds or replaces an entity
+        self.remove(kind, entityId)
+        names, words = self._entry(kind, entityId, name, city, state)
+        for key in names:
+            self.names.insert(key)
+        for key in words:
+            self.words.insert(key)
+
+    def remove(self, kind, entityId):
+        tag = '{0}{1}'.format(kind[0], entityId)
+        if tag not in self.entries:
+            return
+        name, cityKey = self.entries.pop(tag)
+        names, words = self._keys(tag, name)
+        for key in names:
+            self.names.delete(key)
+        for key in words:
+            self.words.delete(key)
+        if cityKey is not None:
+            self.cities[cityKey][1] -= 1
+            if not self.cities[cityKey][1]:
+                del self.cities[cityKey]
+                self.names.delete(cityKey)
+
+    def suggestion(self, key):
+        tag = key.rpartition('\0')[2]
+        if tag == 'c':
+            return ('city', None, self.cities[key][0])
+        return ('venue' if tag[0] == 'v' else 'artist', int(tag[1:]), self.entries[tag][0])
+
+    def search(self, prefix, limit=10):
+        # up to `limit` (kind, id, label) suggestions: names and cities starting
+        # with the prefix, then names with a later word starting with it
+        prefix = normalize(prefix)
+        found = []
+        if not prefix:
+            return found
+        for keys in (self.names, self.words):
+            for key in keys.scan(prefix):
+                if len(found) == limit:
+                    return found
+                suggestion = self.suggestion(key)
+                if suggestion not in found:
+                    found.append(suggestion)
+        return found
+
+    def __len__(self):
+        return len(self.names) + len(self.words)
+
+
+def entity_rows(model, ids=None):
+    query = db.session.query(model.id, model.name, model.city, model.state)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    return [(kinds[model], row.id, row.name, row.city, row.state)
+            for row in query.execution_options(stream_results=True).yield_per(10000)]
+
+
+def build():
+    return PrefixIndex(entity_rows(Venue) + entity_rows(Artist))
+
+
+index = BackgroundIndex('suggestion index', build, 'SUGGEST_MAX_AGE')
+
+
+def get_index():
+    return index.get()
+
+
+def changed(model, entity_id):
+    # applies a created, edited or deleted venue or artist to this worker's index.
+    # Its row is read first, so lookups only wait for the in-memory change
+    if index.index is None:
+        return
+    rows = entity_rows(model, [entity_id])
+    if rows:
+        index.update(lambda current: current.add(*rows[0]))
+    else:
+        index.update(lambda current: current.remove(kinds[model], entity_id))
+
+
+def invalidate():
+    # after bulk loads; rebuilt on the next lookup
+    index.invalidate()
+
+
+def suggest(prefix, limit=10):
+    current = get_index()
+    # changed() edits the index in place
+    with index.lock:
+        return current.search(prefix, limit)
@@ -0,0 +1,60 @@
+import os
+
+# app.py builds a module-level app from DATABASE_URL when imported; the tests make
+# their own apps, so any URL will do as long as it is set
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, Text, create_engine
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import db
+
+
+def create_database(path, artists=(), venues=(), shows=()):
+    # a SQLite stand-in with every table of the models, the PostgreSQL-only array
+    # columns left empty as text; returns its URL
+    url = 'sqlite:///' + str(path)
+    engine = create_engine(url)
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        Table(table.name, metadata, *[Column(column.name, Text if isinstance(column.type, ARRAY) else column.type,
+                                             primary_key=column.primary_key) for column in table.columns])
+    metadata.create_all(engine)
+    for name, rows in [('artists', artists), ('venues', venues), ('shows', shows)]:
+        if rows:
+            engine.execute(metadata.tables[name].insert(), list(rows))
+    engine.dispose()
+    return url
+
+
+def make_app(database_url, replica_urls=(), **config):
+    from app import create_app
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_REPLICA_URLS': list(replica_urls),
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_ENABLED': False,
+    }
+    settings.update(config)
+    return create_app(settings)
+
+
+@pytest.fixture
+def tmp_database(tmp_path):
+    # create_database() inside the test's temporary directory
+    def _create(name='fyyur.db', **rows):
+        return create_database(tmp_path / name, **rows)
+    return _create
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes():
+    # the in-memory indexes are per process, not per app; start every test without
+    import geo
+    import search
+    import suggest
+    from models import Venue, Artist
+    for invalidate in (lambda: search.invalidate(Venue), lambda: search.invalidate(Artist),
+                       suggest.invalidate, geo.invalidate):
+        invalidate()
+    yield
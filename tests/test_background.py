@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from background import BackgroundIndex
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['TEST_MAX_AGE'] = 60
+    with app.app_context():
+        yield app
+
+
+class Builds(object):
+    # build() for a BackgroundIndex: lists of the build number, optionally held
+    # until released so a test can act while a rebuild runs
+
+    def __init__(self):
+        self.count = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.count += 1
+        count = self.count
+        self.started.set()
+        self.release.wait(5)
+        return [count]
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_built_on_first_use_and_kept(app):
+    build = Builds()
+    index = BackgroundIndex('test', build, 'TEST_MAX_AGE')
+    assert index.get() == [1]
+    assert index.get() == [1]
+    assert build.count == 1
+
+
+def test_rebuilt_in_the_background_after_max_age(app):
+    build = Builds()
+    index = BackgroundIndex('test', build, 'TEST_MAX_AGE')
+    index.get()
+    index.builtAt -= 61
+    # the old index answers while the new one is built
+    assert index.get() == [1]
+    wait_for(lambda: index.get() == [2] and not index.rebuilding)
+
+
+def test_updates_during_a_rebuild_are_replayed(app):
+    build = Builds()
+    index = BackgroundIndex('test', build, 'TEST_MAX_AGE')
+    index.get()
+    build.release.clear()
+    build.started.clear()
+    index.refresh(app)
+    build.started.wait(5)
+    index.update(lambda current: current.append('edit'))
+    assert index.get() == [1, 'edit']
+    build.release.set()
+    wait_for(lambda: not index.rebuilding)
+    assert index.get() == [2, 'edit']
+
+
+def test_an_invalidate_discards_a_running_rebuild(app):
+    build = Builds()
+    index = BackgroundIndex('test', build, 'TEST_MAX_AGE')
+    index.get()
+    build.release.clear()
+    build.started.clear()
+    index.refresh(app)
+    build.started.wait(5)
+    index.invalidate()
+    build.release.set()
+    wait_for(lambda: not index.rebuilding)
+    # the rebuild read the database before the write, so the next lookup builds anew
+    assert index.index is None
+    assert index.get() == [3]
+
+
+def test_a_failed_rebuild_keeps_the_old_index(app):
+    def build():
+        if index.index is not None:
+            raise RuntimeError('database unavailable')
+        return ['first']
+
+    index = BackgroundIndex('test', build, 'TEST_MAX_AGE')
+    index.get()
+    index.builtAt -= 61
+    index.get()
+    wait_for(lambda: not index.rebuilding)
+    assert index.get() == ['first']
+    assert time.time() - index.builtAt < 60
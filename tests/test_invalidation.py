@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.conftest import make_app
+
+
+@pytest.fixture
+def app(tmp_database):
+    # two artists booked at one venue; counts as refresh_counts would leave them
+    later = datetime.now() + timedelta(days=30)
+    url = tmp_database(
+        venues=[{'id': 1, 'name': 'The Venue', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 2}],
+        artists=[{'id': 1, 'name': 'First', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 1},
+                 {'id': 2, 'name': 'Second', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 1}],
+        shows=[{'id': 1, 'artist_id': 1, 'venue_id': 1, 'start_time': later},
+               {'id': 2, 'artist_id': 2, 'venue_id': 1, 'start_time': later + timedelta(days=1)}])
+    return make_app(url, CACHE_ENABLED=True, SEARCH_BACKEND='memory')
+
+
+def counts(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return {row['id']: row['num_upcoming_shows'] for row in response.get_json()['data']}
+
+
+def test_deleting_an_artist_refreshes_the_venue_list(app):
+    # the reader is a different browser, so it is not pinned past the cache
+    writer, reader = app.test_client(), app.test_client()
+    assert counts(reader, '/api/v1/venues') == {1: 2}
+    assert writer.delete('/artists/2').get_json() == {'success': True}
+    assert counts(reader, '/api/v1/venues') == {1: 1}
+
+
+def test_deleting_a_venue_refreshes_the_artist_search(app):
+    writer, reader = app.test_client(), app.test_client()
+    assert counts(reader, '/api/v1/artists/search?q=') == {1: 1, 2: 1}
+    assert writer.delete('/venues/1').get_json() == {'success': True}
+    assert counts(reader, '/api/v1/artists/search?q=') == {1: 0, 2: 0}
+
+
+def book(client, artist_id, days):
+    start = (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    response = client.post('/shows/create', data={'artist_id': str(artist_id), 'venue_id': '1', 'start_time': start})
+    assert b'Show was successfully listed!' in response.data
+
+
+def test_a_new_show_refreshes_the_artist_search(app):
+    writer, reader = app.test_client(), app.test_client()
+    assert counts(reader, '/api/v1/artists/search?q=') == {1: 1, 2: 1}
+    book(writer, 1, 60)
+    assert counts(reader, '/api/v1/artists/search?q=') == {1: 2, 2: 1}
+
+
+def test_a_new_show_refreshes_the_artists_by_genre(app, monkeypatch):
+    # the genre filter needs PostgreSQL arrays, so the page lists every artist here
+    import queries
+    from models import db, Artist
+
+    def every_artist(model, genre, **page):
+        rows = db.session.query(Artist.id, Artist.name, Artist.city, Artist.state,
+                                Artist.upcoming_shows_count.label('num_upcoming_shows')).order_by(Artist.id)
+        return queries.Page(rows.all(), None, None)
+
+    monkeypatch.setattr(queries, 'genre_page', every_artist)
+    writer, reader = app.test_client(), app.test_client()
+    assert counts(reader, '/api/v1/artists/genre/Jazz') == {1: 1, 2: 1}
+    book(writer, 2, 60)
+    assert counts(reader, '/api/v1/artists/genre/Jazz') == {1: 1, 2: 2}
+
+
+def test_a_failed_invalidation_does_not_fail_the_save(app, monkeypatch):
+    from cache import responseCache
+
+    def broken(*tags):
+        raise ConnectionError('cache unreachable')
+
+    monkeypatch.setattr(responseCache, 'invalidate', broken)
+    start = (datetime.now() + timedelta(days=60)).strftime('%Y-%m-%d %H:%M:%S')
+    response = app.test_client().post('/shows/create', data={'artist_id': '1', 'venue_id': '1', 'start_time': start})
+    assert b'Show was successfully listed!' in response.data
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+import pytest
+from models import Artist, Show
+from queries import encode_cursor, decode_cursor
+from tests.conftest import make_app
+
+
+@pytest.fixture
+def client(tmp_database):
+    start = datetime(2030, 1, 1, 20, 0)
+    url = tmp_database(
+        artists=[{'id': i, 'name': 'Artist {0}'.format(i)} for i in range(1, 8)],
+        venues=[{'id': 1, 'name': 'Venue', 'city': 'Austin', 'state': 'TX'}],
+        # shows 1 and 2 start at the same time, so the id breaks the tie
+        shows=[{'id': i, 'artist_id': i, 'venue_id': 1, 'start_time': start + timedelta(days=max(i - 1, 1))}
+               for i in range(1, 6)])
+    return make_app(url).test_client()
+
+
+def ids(response):
+    assert response.status_code == 200
+    return [row['id'] for row in response.get_json()['data']]
+
+
+def test_cursor_round_trip():
+    start = datetime(2030, 1, 1, 20, 0)
+    cursor = encode_cursor([start, 42])
+    assert '=' not in cursor
+    assert decode_cursor(cursor, [Show.start_time, Show.id]) == [start, 42]
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', '!!', encode_cursor([1, 2]), encode_cursor({'id': 1}),
+                                    encode_cursor(['1']), encode_cursor([True])])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, [Artist.id])
+
+
+@pytest.mark.parametrize('values', [[5, 1], ['tomorrow', 1], [datetime(2030, 1, 1), 'one']])
+def test_invalid_datetime_cursor_is_rejected(values):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(values), [Show.start_time, Show.id])
+
+
+@pytest.mark.parametrize('path', ['/api/v1/artists', '/api/v1/shows', '/artists'])
+def test_bad_cursor_is_a_400(client, path):
+    assert client.get(path + '?after=garbage').status_code == 400
+    assert client.get(path + '?before=' + encode_cursor([1, 2, 3])).status_code == 400
+
+
+def test_next_and_prev_pages_keep_their_order(client):
+    first = client.get('/api/v1/artists?limit=3').get_json()
+    assert [row['id'] for row in first['data']] == [1, 2, 3]
+    assert first['prev'] is None
+    second = client.get('/api/v1/artists?limit=3&after=' + first['next']).get_json()
+    assert [row['id'] for row in second['data']] == [4, 5, 6]
+    last = client.get('/api/v1/artists?limit=3&after=' + second['next']).get_json()
+    assert [row['id'] for row in last['data']] == [7]
+    assert last['next'] is None
+    # going back returns the same pages, still in ascending order
+    assert ids(client.get('/api/v1/artists?limit=3&before=' + last['prev'])) == [4, 5, 6]
+    back = client.get('/api/v1/artists?limit=3&before=' + second['prev']).get_json()
+    assert [row['id'] for row in back['data']] == [1, 2, 3]
+    assert back['prev'] is None and back['next'] is not None
+
+
+def test_datetime_cursors_page_through_ties(client):
+    first = client.get('/api/v1/shows?limit=2').get_json()
+    assert [row['artist_id'] for row in first['data']] == [1, 2]
+    second = client.get('/api/v1/shows?limit=2&after=' + first['next']).get_json()
+    assert [row['artist_id'] for row in second['data']] == [3, 4]
+    back = client.get('/api/v1/shows?limit=2&before=' + second['prev']).get_json()
+    assert [row['artist_id'] for row in back['data']] == [1, 2]
@@ -0,0 +1,99 @@
+import time
+import pytest
+from models import db, Artist
+from routing import replicas, stickyCookie
+from tests.conftest import make_app
+
+
+@pytest.fixture
+def databases(tmp_database):
+    # the replica has not caught up with the primary's rename of artist 1
+    primary = tmp_database('primary.db', artists=[{'id': 1, 'name': 'Primary One'}, {'id': 2, 'name': 'Shared'}])
+    replica = tmp_database('replica.db', artists=[{'id': 1, 'name': 'Replica One'}, {'id': 2, 'name': 'Shared'}])
+    return primary, replica
+
+
+def artist_names(client):
+    response = client.get('/api/v1/artists')
+    assert response.status_code == 200
+    return [artist['name'] for artist in response.get_json()['data']]
+
+
+def test_get_requests_read_from_the_replica(databases):
+    app = make_app(databases[0], [databases[1]])
+    assert artist_names(app.test_client()) == ['Replica One', 'Shared']
+
+
+def test_writes_and_commands_use_the_primary(databases):
+    app = make_app(databases[0], [databases[1]])
+    with app.test_request_context('/artists/1', method='DELETE'):
+        assert db.session.query(Artist.name).filter_by(id=1).scalar() == 'Primary One'
+    with app.app_context():
+        assert db.session.query(Artist.name).filter_by(id=1).scalar() == 'Primary One'
+
+
+def test_without_replicas_everything_uses_the_primary(databases):
+    app = make_app(databases[0])
+    assert artist_names(app.test_client()) == ['Primary One', 'Shared']
+
+
+def test_a_write_pins_the_browser_to_the_primary(databases):
+    app = make_app(databases[0], [databases[1]])
+    writer, other = app.test_client(), app.test_client()
+    assert writer.delete('/artists/1').get_json() == {'success': True}
+    assert artist_names(writer) == ['Shared']
+    assert artist_names(other) == ['Replica One', 'Shared']
+    # once the sticky window is over the writer reads from the replica again
+    writer.set_cookie('localhost', stickyCookie, '{0:.3f}'.format(time.time() - 1))
+    assert artist_names(writer) == ['Replica One', 'Shared']
+
+
+def test_searches_read_from_the_replica_without_pinning(databases):
+    app = make_app(databases[0], [databases[1]])
+    client = app.test_client()
+    response = client.post('/artists/search', data={'search_term': 'one'})
+    assert b'Replica One' in response.data
+    assert stickyCookie not in response.headers.get('Set-Cookie', '')
+    assert artist_names(client) == ['Replica One', 'Shared']
+
+
+def test_an_unreachable_replica_falls_back_to_the_primary(databases, tmp_path):
+    missing = 'sqlite:///' + str(tmp_path / 'missing' / 'replica.db')
+    app = make_app(databases[0], [missing])
+    client = app.test_client()
+    assert artist_names(client) == ['Primary One', 'Shared']
+    assert client.get('/replicas/status').get_json() == [{'replica': 0, 'healthy': False}]
+
+
+def test_replica_health_is_checked_once_per_window(databases, monkeypatch):
+    app = make_app(databases[0], [databases[1]], REPLICA_CHECK_SECONDS=60)
+    client = app.test_client()
+    artist_names(client)
+    engine = replicas.engines[0]
+    connect = engine.connect
+    checks = []
+
+    def counting_connect(*args, **kwargs):
+        checks.append(time.time())
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(engine, 'connect', counting_connect)
+    artist_names(client)
+    artist_names(client)
+    assert checks == []
+    replicas.checkedAt[0] = 0.0
+    artist_names(client)
+    assert len(checks) == 1
+
+
+def test_cached_pages_do_not_hide_a_write(databases, tmp_path):
+    app = make_app(databases[0], [databases[1]], CACHE_ENABLED=True)
+    writer, reader = app.test_client(), app.test_client()
+    assert artist_names(reader) == ['Replica One', 'Shared']
+    writer.delete('/artists/1')
+    # the writer skips the cache; the lagging replica's page is served but not stored
+    assert artist_names(writer) == ['Shared']
+    assert artist_names(reader) == ['Replica One', 'Shared']
+    with app.app_context():
+        replicas.engines[0].execute('DELETE FROM artists WHERE id = 1')
+    assert artist_names(reader) == ['Shared']
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import pytest
+from scheduling import Bookings
+from tests.conftest import make_app
+
+# SHOW_DURATION_MINUTES is left at its default of two hours
+hours = timedelta(hours=1)
+start = (datetime.now() + timedelta(days=30)).replace(hour=20, minute=0, second=0, microsecond=0)
+
+
+def test_clash_finds_the_overlapping_neighbour():
+    bookings = Bookings(2 * hours)
+    for booked in (start, start + 6 * hours, start - 6 * hours):
+        bookings.add(1, booked)
+    # overlaps the show before and the show after, on either side of the bisect
+    assert bookings.clash(1, start + hours) == start
+    assert bookings.clash(1, start - hours) == start
+    assert bookings.clash(1, start + 5 * hours) == start + 6 * hours
+    assert bookings.clash(1, start) == start
+
+
+def test_clash_allows_back_to_back_shows():
+    bookings = Bookings(2 * hours)
+    bookings.add(1, start)
+    assert bookings.clash(1, start + 2 * hours) is None
+    assert bookings.clash(1, start - 2 * hours) is None
+    assert bookings.clash(2, start) is None
+
+
+@pytest.fixture
+def app(tmp_database):
+    # one show booked: artist 1 at venue 1
+    url = tmp_database(
+        venues=[{'id': 1, 'name': 'The Venue', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 1},
+                {'id': 2, 'name': 'The Other Venue', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 0}],
+        artists=[{'id': 1, 'name': 'First', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 1},
+                 {'id': 2, 'name': 'Second', 'city': 'Austin', 'state': 'TX', 'upcoming_shows_count': 0}],
+        shows=[{'id': 1, 'artist_id': 1, 'venue_id': 1, 'start_time': start}])
+    return make_app(url)
+
+
+def show(artist_id, venue_id, at):
+    return {'artist_id': str(artist_id), 'venue_id': str(venue_id), 'start_time': at.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def schedule(app, shows, query=''):
+    response = app.test_client().post('/api/v1/shows/batch' + query, json={'shows': shows})
+    return response.status_code, response.get_json()
+
+
+def show_count(app):
+    from models import Show
+    with app.app_context():
+        return Show.query.count()
+
+
+def test_a_batch_is_inserted(app):
+    status, body = schedule(app, [show(2, 1, start + 2 * hours), show(1, 2, start + 4 * hours)])
+    assert (status, body) == (201, {'created': 2, 'errors': []})
+    assert show_count(app) == 3
+
+
+def test_a_clash_with_a_booked_show_rejects_the_batch(app):
+    status, body = schedule(app, [show(2, 2, start), show(2, 1, start + hours)])
+    assert status == 422
+    assert body['created'] == 0
+    assert [error['row'] for error in body['errors']] == [2]
+    assert body['errors'][0]['error'].startswith('Venue 1 already has a show at')
+    assert show_count(app) == 1
+
+
+def test_a_clash_within_the_batch_is_reported(app):
+    status, body = schedule(app, [show(2, 1, start + 4 * hours), show(2, 2, start + 5 * hours)])
+    assert status == 422
+    assert [error['row'] for error in body['errors']] == [2]
+    assert body['errors'][0]['error'].startswith('Artist 2 already plays at')
+    assert show_count(app) == 1
+
+
+def test_partial_inserts_the_valid_rows(app):
+    shows = [show(1, 2, start + hours), show(2, 2, start + 4 * hours), show(2, 1, start + 2 * hours)]
+    status, body = schedule(app, shows, '?partial=true')
+    assert status == 201
+    assert body['created'] == 2
+    assert [error['row'] for error in body['errors']] == [1]
+    assert body['errors'][0]['error'].startswith('Artist 1 already plays at')
+    assert show_count(app) == 3
+
+
+def test_missing_venues_and_artists_are_reported(app):
+    status, body = schedule(app, [show(2, 9, start + 4 * hours), show(9, 2, start + 4 * hours)], '?partial=true')
+    assert (status, body) == (422, {'created': 0, 'errors': [
+        {'row': 1, 'error': 'Venue with ID 9 does not exist.'},
+        {'row': 2, 'error': 'Artist with ID 9 does not exist.'}]})
+    assert show_count(app) == 1
@@ -0,0 +1,41 @@
+from tests.conftest import make_app
+
+
+def test_suggestions_are_answered_without_queries(tmp_database):
+    url = tmp_database(venues=[{'id': 1, 'name': 'The Blue Note', 'city': 'Austin', 'state': 'TX'}],
+                       artists=[{'id': 1, 'name': 'Blue Moon', 'city': 'Austin', 'state': 'TX'}])
+    client = make_app(url).test_client()
+    # the first lookup builds the index
+    client.get('/api/v1/suggest?q=blu')
+    response = client.get('/api/v1/suggest?q=blu')
+    assert response.get_json()['data'] == [{'type': 'artist', 'id': 1, 'name': 'Blue Moon'},
+                                           {'type': 'venue', 'id': 1, 'name': 'The Blue Note'}]
+    assert 'desc="0 queries"' in response.headers['Server-Timing']
+    assert 'Last-Modified' not in response.headers and response.headers['ETag']
+
+
+def test_changes_are_read_before_taking_the_lock(tmp_database, monkeypatch):
+    import suggest
+    from models import db, Venue
+    url = tmp_database(venues=[{'id': 1, 'name': 'The Blue Note', 'city': 'Austin', 'state': 'TX'}])
+    app = make_app(url)
+    entity_rows = suggest.entity_rows
+    locked = []
+
+    def checked_rows(*args, **kwargs):
+        locked.append(suggest.index.lock.locked())
+        return entity_rows(*args, **kwargs)
+
+    with app.app_context():
+        assert suggest.suggest('blue') == [('venue', 1, 'The Blue Note')]
+        monkeypatch.setattr(suggest, 'entity_rows', checked_rows)
+        db.session.query(Venue).filter_by(id=1).update({'name': 'Green Room'})
+        db.session.commit()
+        suggest.changed(Venue, 1)
+        assert suggest.suggest('blue') == []
+        assert suggest.suggest('green') == [('venue', 1, 'Green Room')]
+        db.session.query(Venue).filter_by(id=1).delete()
+        db.session.commit()
+        suggest.changed(Venue, 1)
+        assert suggest.suggest('green') == []
+    assert locked == [False, False]